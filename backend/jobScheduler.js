@@ -0,0 +1,142 @@
+// Bounded job scheduler for the Python pipelines.
+// A fixed number of jobs run at once; queued jobs are dispatched round-robin
+// across users so one user's burst cannot starve everyone else, and new jobs
+// are rejected up front once the queue (or a user's share of it) is full.
+// Admission reserves a place synchronously, so requests that are still
+// uploading or creating records count against the limits before they enqueue.
+
+class JobScheduler {
+  constructor({ maxConcurrent = 2, maxQueued = 20, maxQueuedPerUser = 5 } = {}) {
+    this.maxConcurrent = maxConcurrent
+    this.maxQueued = maxQueued
+    this.maxQueuedPerUser = maxQueuedPerUser
+    this.running = new Set()
+    this.queues = new Map() // userId -> [job]
+    this.userOrder = [] // round-robin order of users with queued jobs
+    this.byId = new Map() // any generation id -> job
+    this.reserved = 0
+    this.reservedByUser = new Map() // userId -> count
+  }
+
+  queuedCount() {
+    let total = 0
+    for (const queue of this.queues.values()) total += queue.length
+    return total
+  }
+
+  // Reason a new job from userId must be refused, or null
+  _refusal(userId) {
+    const pending = this.queuedCount() + this.reserved
+    if (this.running.size + pending < this.maxConcurrent) return null
+    if (this.running.size + pending - this.maxConcurrent >= this.maxQueued) {
+      return "Server is busy: the job queue is full. Please retry shortly."
+    }
+    const userPending = (this.queues.get(userId) || []).length + (this.reservedByUser.get(userId) || 0)
+    if (userPending >= this.maxQueuedPerUser) {
+      return `You already have ${userPending} jobs waiting. Please wait for them to start.`
+    }
+    return null
+  }
+
+  // Check before doing any work for a request (upload, DB record). On success the
+  // returned reservation holds a place until it is passed to enqueue() or release()d.
+  canAccept(userId) {
+    const reason = this._refusal(userId)
+    if (reason) return { ok: false, reason }
+    this.reserved++
+    this.reservedByUser.set(userId, (this.reservedByUser.get(userId) || 0) + 1)
+    return { ok: true, reservation: { userId, active: true } }
+  }
+
+  release(reservation) {
+    if (!reservation || !reservation.active) return
+    reservation.active = false
+    this.reserved--
+    const left = this.reservedByUser.get(reservation.userId) - 1
+    if (left > 0) this.reservedByUser.set(reservation.userId, left)
+    else this.reservedByUser.delete(reservation.userId)
+  }
+
+  // run: () => Promise, resolved when the job's process has exited.
+  // Without an active reservation the limits are checked here and an Error is thrown when full.
+  enqueue(userId, ids, run, reservation = null) {
+    if (reservation && reservation.active) {
+      this.release(reservation)
+    } else {
+      const reason = this._refusal(userId)
+      if (reason) throw new Error(reason)
+    }
+    const job = { userId, ids, run }
+    for (const id of ids) this.byId.set(id, job)
+    if (!this.queues.has(userId)) this.queues.set(userId, [])
+    this.queues.get(userId).push(job)
+    if (!this.userOrder.includes(userId)) this.userOrder.push(userId)
+    this._pump()
+    return this.position(ids[0])
+  }
+
+  // Order in which queued jobs will be dispatched under round-robin
+  _dispatchOrder() {
+    const order = []
+    const depth = Math.max(0, ...[...this.queues.values()].map((q) => q.length))
+    for (let round = 0; round < depth; round++) {
+      for (const userId of this.userOrder) {
+        const job = (this.queues.get(userId) || [])[round]
+        if (job) order.push(job)
+      }
+    }
+    return order
+  }
+
+  // 0 = running, n = n-th in line, null = unknown or finished
+  position(id) {
+    const job = this.byId.get(id)
+    if (!job) return null
+    if (this.running.has(job)) return 0
+    const index = this._dispatchOrder().indexOf(job)
+    return index === -1 ? null : index + 1
+  }
+
+  stats() {
+    return {
+      running: this.running.size,
+      queued: this.queuedCount(),
+      reserved: this.reserved,
+      maxConcurrent: this.maxConcurrent,
+    }
+  }
+
+  _next() {
+    while (this.userOrder.length) {
+      const userId = this.userOrder.shift()
+      const queue = this.queues.get(userId) || []
+      const job = queue.shift()
+      if (queue.length) {
+        // Back of the line until every other waiting user has had a turn
+        this.userOrder.push(userId)
+      } else {
+        this.queues.delete(userId)
+      }
+      if (job) return job
+    }
+    return null
+  }
+
+  _pump() {
+    while (this.running.size < this.maxConcurrent) {
+      const job = this._next()
+      if (!job) return
+      this.running.add(job)
+      Promise.resolve()
+        .then(job.run)
+        .catch((err) => console.error("Scheduled job failed:", err))
+        .finally(() => {
+          this.running.delete(job)
+          for (const id of job.ids) this.byId.delete(id)
+          this._pump()
+        })
+    }
+  }
+}
+
+module.exports = { JobScheduler }
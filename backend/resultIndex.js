@@ -0,0 +1,111 @@
+// Result index for output-level dedup.
+// Maps (PDF content hash, output type, normalized settings) to a previously
+// generated file in Supabase Storage, so a repeat upload of the same paper with
+// the same settings reuses that output instead of running the pipeline again.
+// Stored as a small JSON file; bump RESULT_INDEX_VERSION when pipeline output
+// changes so older results stop matching.
+
+const crypto = require("crypto")
+const fs = require("fs")
+const path = require("path")
+
+const RESULT_INDEX_VERSION = "2"
+
+function fileSha256(filePath) {
+  return new Promise((resolve, reject) => {
+    const hash = crypto.createHash("sha256")
+    fs.createReadStream(filePath)
+      .on("error", reject)
+      .on("data", (chunk) => hash.update(chunk))
+      .on("end", () => resolve(hash.digest("hex")))
+  })
+}
+
+// "Puck -- Upbeat" and "puck" select the same voice
+function normalizeVoice(label, fallback) {
+  return (label || fallback).split("--")[0].trim().toLowerCase()
+}
+
+// Only the settings that change a given output take part in its key.
+// jobType is the requested output type: a podcast from a "both" job is written from the
+// structured Phase-2 text (which depends on length), a standalone one from chunk summaries.
+// Presentations are built the same way by either job.
+function normalizeSettings(outputType, settings, podcastExtension, jobType = outputType) {
+  const length = String(settings.length || "medium").toLowerCase()
+  if (outputType === "presentation") {
+    return {
+      template: String(settings.template || "1").trim(),
+      length,
+    }
+  }
+  const quality = String(settings.quality || "low").toLowerCase()
+  const podcast = {
+    pipeline: jobType === "both" ? "both" : "podcast",
+    AlexVoice: normalizeVoice(settings.AlexVoice, "Kore"),
+    AveryVoice: normalizeVoice(settings.AveryVoice, "Puck"),
+    quality,
+    format: podcastExtension(quality),
+  }
+  if (jobType === "both") podcast.length = length
+  return podcast
+}
+
+class ResultIndex {
+  constructor(filePath) {
+    this.filePath = filePath
+    this.entries = {}
+    try {
+      this.entries = JSON.parse(fs.readFileSync(filePath, "utf-8"))
+    } catch (error) {
+      if (error.code !== "ENOENT") console.warn("Could not read result index, starting empty:", error.message)
+    }
+  }
+
+  key(pdfHash, outputType, normalizedSettings) {
+    const fields = Object.keys(normalizedSettings)
+      .sort()
+      .map((name) => `${name}=${normalizedSettings[name]}`)
+    return [RESULT_INDEX_VERSION, pdfHash, outputType, ...fields].join("|")
+  }
+
+  get(key) {
+    return this.entries[key] || null
+  }
+
+  put(key, entry) {
+    this.entries[key] = { ...entry, createdAt: new Date().toISOString() }
+    this._save()
+  }
+
+  // Forget results whose output or source PDF is gone (e.g. the generation was deleted)
+  removeByPath(storagePath) {
+    let changed = false
+    for (const [key, entry] of Object.entries(this.entries)) {
+      if (entry.storagePath === storagePath || entry.originalPath === storagePath) {
+        delete this.entries[key]
+        changed = true
+      }
+    }
+    if (changed) this._save()
+  }
+
+  remove(key) {
+    if (!(key in this.entries)) return
+    delete this.entries[key]
+    this._save()
+  }
+
+  _save() {
+    try {
+      fs.mkdirSync(path.dirname(this.filePath), { recursive: true })
+      // Write then rename so a crash never leaves a half-written index
+      const tmpPath = `${this.filePath}.tmp`
+      fs.writeFileSync(tmpPath, JSON.stringify(this.entries, null, 2))
+      fs.renameSync(tmpPath, this.filePath)
+    } catch (error) {
+      console.warn("Could not write result index:", error.message)
+    }
+  }
+}
+
+module.exports = { ResultIndex, fileSha256, normalizeSettings }
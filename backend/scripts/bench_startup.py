@@ -0,0 +1,70 @@
+"""
+Cold-start import budget for the pipeline entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each entry module, reports the cumulative import time and the slowest
+imports, and exits non-zero when any module exceeds its budget.
+
+Usage: python bench_startup.py [--budget-ms N] [--top N] [module ...]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entry points and what each may cost on a cold start (milliseconds)
+DEFAULT_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "800"))
+ENTRY_MODULES = ["generate_podcast", "ppt_gen", "generate_both"]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str):
+    """Return (cumulative_us, [(self_us, name), ...]) for importing module."""
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "startup-bench")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()[-2000:]}")
+
+    cumulative, entries = 0, []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        entries.append((self_us, name))
+        # Top-level imports have a single leading space; their cumulative times add up
+        if len(indent) == 1:
+            cumulative += cum_us
+    return cumulative, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        cumulative, entries = measure(module)
+        total_ms = cumulative / 1000
+        status = "OK" if total_ms <= args.budget_ms else "OVER BUDGET"
+        failed |= total_ms > args.budget_ms
+        print(f"[{status}] {module}: {total_ms:.1f} ms (budget {args.budget_ms} ms)")
+        for self_us, name in sorted(entries, reverse=True)[:args.top]:
+            print(f"    {self_us / 1000:8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
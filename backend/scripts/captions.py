@@ -0,0 +1,131 @@
+import re
+import bisect
+
+# "Figure 3: ..." / "Fig. 3. ..." at the start of a text block
+CAPTION_RE = re.compile(r"^(?:Figure|Fig\.)\s?\d+\s?[:.]\s?\S", re.IGNORECASE)
+
+
+# ---------- Page text-block index ----------
+class PageTextIndex:
+    """
+    Text blocks of one page, extracted once and sorted by their top edge,
+    so every figure on the page can look up its caption with a bisect.
+    """
+
+    def __init__(self, page):
+        # block = (x0, y0, x1, y1, text, block_no, block_type); type 0 is text
+        blocks = [b for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+        blocks.sort(key=lambda b: b[1])
+        self._blocks = blocks
+        self._tops = [b[1] for b in blocks]
+
+    def caption_below(self, rect, max_gap: float = 400, x_margin: float = 300, y_tol: float = 2):
+        """
+        Nearest block below `rect` that starts with "Figure N"/"Fig. N",
+        horizontally overlapping the figure (widened by x_margin) and
+        starting within max_gap points of its bottom edge. None if absent.
+        """
+        start = bisect.bisect_left(self._tops, rect.y1 - y_tol)
+        limit = rect.y1 + max_gap
+        for x0, y0, x1, _, text, _, _ in self._blocks[start:]:
+            if y0 > limit:
+                break
+            if x1 < rect.x0 - x_margin or x0 > rect.x1 + x_margin:
+                continue
+            text = " ".join(text.split())
+            if CAPTION_RE.match(text):
+                return text
+        return None
+
+
+# ---------- Figure caption matching (Phase 5) ----------
+NO_CAPTION = "No Figure caption found"
+# Minimum share of a partial caption's tokens found in a full caption
+CAPTION_MATCH_THRESHOLD = 0.6
+
+# "Figure 2: ...", "**Fig. 3.** ...", "1. Figure 4a: ...", "- 2) Figure 5 ..."
+_LABEL_RE = re.compile(
+    r"^\s*[-*#>\s]*(?:\d+[.)]\s*)?[-*#>\s]*\**\s*(?:Figure|Fig\.?)\s*(?P<num>\d+)(?P<sub>[a-z]?)\b\**\s*[:.]?\s*(?P<text>.*)$",
+    re.IGNORECASE,
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOP_TOKENS = {"figure", "fig", "the", "and", "for", "with", "from", "this", "that", "are", "our"}
+
+
+def figure_label(caption: str):
+    """"2" for "Figure 2: ...", "2a" for "Fig. 2A ..."; None when unlabelled."""
+    m = _LABEL_RE.match(caption or "")
+    return (m.group("num") + m.group("sub")).lower() if m else None
+
+
+def parse_figure_captions(text: str):
+    """
+    Parse the Phase 4 caption list ("Figure N" then the caption, possibly over
+    several lines) into [(label, "Figure N: caption"), ...] in document order,
+    where label is "N", or e.g. "2a" for a sub-figure.
+    """
+    entries, label, body = [], None, []
+
+    def flush():
+        caption = " ".join(" ".join(body).split()).strip("* ")
+        if label is not None and caption:
+            entries.append((label, f"Figure {label}: {caption}"))
+
+    for line in (text or "").splitlines():
+        m = _LABEL_RE.match(line)
+        if m:
+            flush()
+            label, body = (m.group("num") + m.group("sub")).lower(), [m.group("text")]
+        elif line.strip():
+            body.append(line.strip())
+        elif body and any(body):
+            # A blank line ends a caption
+            flush()
+            label, body = None, []
+    flush()
+    return entries
+
+
+def _tokens(text: str) -> set:
+    return {t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2 and t not in _STOP_TOKENS}
+
+
+def match_captions(image_captions: dict, figure_captions_text: str,
+                   threshold: float = CAPTION_MATCH_THRESHOLD) -> dict:
+    """
+    Map image filenames to full figure captions.
+    Exact figure-label matches first; remaining partial captions are scored by
+    token overlap against the still unused full captions and kept only at or
+    above `threshold`. Each full caption is assigned to at most one image.
+    """
+    full = parse_figure_captions(figure_captions_text)
+    by_label = {}
+    for i, (label, _) in enumerate(full):
+        by_label.setdefault(label, i)
+
+    matched, used, leftovers = {}, set(), []
+    for image, partial in image_captions.items():
+        if not partial or partial == NO_CAPTION:
+            continue
+        i = by_label.get(figure_label(partial))
+        if i is not None and i not in used:
+            matched[image] = full[i][1]
+            used.add(i)
+        else:
+            leftovers.append((image, partial))
+
+    for image, partial in leftovers:
+        wanted = _tokens(_LABEL_RE.sub(r"\g<text>", partial))
+        if not wanted:
+            continue
+        best, best_score = None, 0.0
+        for i, (_, caption) in enumerate(full):
+            if i in used:
+                continue
+            score = len(wanted & _tokens(caption)) / len(wanted)
+            if score > best_score:
+                best, best_score = i, score
+        if best is not None and best_score >= threshold:
+            matched[image] = full[best][1]
+            used.add(best)
+    return matched
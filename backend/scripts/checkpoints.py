@@ -0,0 +1,150 @@
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import inspect
+
+import env  # noqa: F401  (loads backend/.env)
+
+# ---------- Phase checkpoints ----------
+# Each phase's output is stored under checkpoints/<key>/, where the key covers
+# the PDF content, the job settings and PIPELINE_VERSION. A resumed run loads
+# completed phases instead of recomputing them; a successful run clears its
+# checkpoints. Bump PIPELINE_VERSION whenever a phase's output format changes.
+# A run holds an exclusive lock on its key for its whole lifetime; an identical
+# job started meanwhile runs without checkpoints rather than sharing the directory.
+PIPELINE_VERSION = "1"
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints")
+RESUME_FLAG = "--resume"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def pop_resume_flag(argv: list) -> bool:
+    """Remove --resume from argv in place; also honours PIPELINE_RESUME=1."""
+    resume = RESUME_FLAG in argv
+    while RESUME_FLAG in argv:
+        argv.remove(RESUME_FLAG)
+    return resume or os.getenv("PIPELINE_RESUME") == "1"
+
+
+class CheckpointStore:
+    """JSON and directory checkpoints for one job. dir=None disables checkpointing."""
+
+    def __init__(self, dir: str = None, resume: bool = False, lock_fd: int = None):
+        self.dir = dir
+        self.resume = resume and dir is not None
+        self._lock_fd = lock_fd
+        if dir:
+            os.makedirs(dir, exist_ok=True)
+
+    @classmethod
+    def for_job(cls, pdf_path: str, settings: dict, resume: bool = False, root: str = CHECKPOINT_DIR):
+        key_src = json.dumps(
+            {"pdf": file_sha256(pdf_path), "settings": settings, "version": PIPELINE_VERSION},
+            sort_keys=True,
+        )
+        key = hashlib.sha256(key_src.encode("utf-8")).hexdigest()[:32]
+        lock_fd = _lock_key(root, key)
+        if lock_fd is None:
+            print("[resume] Another run of this job holds its checkpoints; running without checkpoints")
+            return cls()
+        return cls(os.path.join(root, key), resume=resume, lock_fd=lock_fd)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def has(self, name: str) -> bool:
+        return self.resume and os.path.exists(self.path(name + ".json"))
+
+    def load(self, name: str):
+        with open(self.path(name + ".json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, name: str, data) -> None:
+        if not self.dir:
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        final = self.path(name + ".json")
+        tmp = final + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, final)
+
+    async def run(self, name: str, fn, *args, valid=None):
+        """
+        Return the checkpointed result of phase `name`, or run fn(*args) and save it.
+        A result failing `valid(result)` (e.g. a parse fallback) is returned but not
+        saved, so a resumed run retries the phase instead of reusing it.
+        """
+        if self.has(name):
+            print(f"[resume] Skipping completed phase '{name}'")
+            return self.load(name)
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        if valid is not None and not valid(result):
+            print(f"[resume] Not checkpointing phase '{name}': result failed validation")
+            return result
+        self.save(name, result)
+        return result
+
+    # Directory phases (rendered images) are copied in and out as a whole
+    def has_dir(self, name: str) -> bool:
+        return self.resume and os.path.isdir(self.path(name)) and self.has(name)
+
+    def save_dir(self, name: str, src_dir: str, meta=None) -> None:
+        if not self.dir:
+            return
+        dst = self.path(name)
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src_dir, dst)
+        self.save(name, meta)
+
+    def restore_dir(self, name: str, dst_dir: str):
+        shutil.copytree(self.path(name), dst_dir, dirs_exist_ok=True)
+        return self.load(name)
+
+    def phase_dir(self, name: str):
+        """
+        Directory for a phase that checkpoints many files (e.g. audio segments).
+        Kept when resuming, emptied otherwise; None when checkpointing is disabled.
+        """
+        if not self.dir:
+            return None
+        path = self.path(name)
+        if not self.resume:
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def clear(self) -> None:
+        if self.dir:
+            shutil.rmtree(self.dir, ignore_errors=True)
+        if self._lock_fd is not None:
+            # The lock file stays behind: unlinking it would let a waiting opener
+            # and a new one lock different files
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def _lock_key(root: str, key: str):
+    """Exclusive, non-blocking lock on checkpoint key `key`; the fd, or None if held elsewhere."""
+    os.makedirs(root, exist_ok=True)
+    fd = os.open(os.path.join(root, key + ".lock"), os.O_CREAT | os.O_RDWR, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    # Released by clear() or when the process exits
+    return fd
+
@@ -0,0 +1,7 @@
+# ---------- Environment ----------
+# Imported ahead of any other local module by every module that reads settings
+# with os.getenv at import time, so values from backend/.env are already in
+# os.environ. Variables set in the real environment take precedence.
+from dotenv import load_dotenv
+
+load_dotenv()
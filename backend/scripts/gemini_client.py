@@ -0,0 +1,106 @@
+import os
+import asyncio
+
+import env  # noqa: F401  (loads backend/.env)
+from hedging import hedge_policy, size_bucket
+from stage_limits import astage_slot
+
+# ---------- Shared Gemini client ----------
+# One client per process, so every phase reuses the same pooled HTTP
+# connections (keep-alive, HTTP/2 when the optional `h2` package is
+# installed). GEMINI_BASE_URL can point at a local stand-in server.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
+# google-genai sends HttpOptions.timeout with every request as one value, which
+# overrides any per-phase httpx.Timeout on the client, so there is a single timeout
+GEMINI_READ_TIMEOUT_S = float(os.getenv("GEMINI_READ_TIMEOUT_S", "600"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_KEEPALIVE_EXPIRY_S = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_S", "60"))
+
+QUOTA_BACKOFF_S = 10
+QUOTA_BACKOFF_MAX_S = 60
+
+_client = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _transport_args() -> dict:
+    import httpx
+    return {
+        "timeout": httpx.Timeout(GEMINI_READ_TIMEOUT_S),
+        "limits": httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+            keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY_S,
+        ),
+        "http2": _http2_available(),
+    }
+
+
+def get_client():
+    """Process-wide google-genai client; created on first use."""
+    global _client
+    if _client is None:
+        # Allow either GEMINI_API_KEY or GOOGLE_API_KEY
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise EnvironmentError("GOOGLE_API_KEY not found in environment variables.")
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(
+            base_url=GEMINI_BASE_URL,
+            timeout=int(GEMINI_READ_TIMEOUT_S * 1000),
+            client_args=_transport_args(),
+            async_client_args=_transport_args(),
+        )
+        _client = genai.Client(api_key=api_key, http_options=http_options)
+    return _client
+
+
+# ---------- Quota backoff ----------
+async def with_quota_backoff(make_request):
+    """
+    Await make_request() (a zero-argument coroutine factory), retrying on
+    RESOURCE_EXHAUSTED with exponential backoff. asyncio.sleep keeps the event loop free.
+    """
+    from google.genai.errors import ClientError
+    delay = QUOTA_BACKOFF_S
+    while True:
+        try:
+            return await make_request()
+        except ClientError as e:
+            if "RESOURCE_EXHAUSTED" not in str(e):
+                raise
+            print(f"Quota hit, waiting {delay}s before retry...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, QUOTA_BACKOFF_MAX_S)
+
+
+# ---------- Text generation ----------
+async def generate_text(prompt, model="gemini-2.5-flash", temperature=None) -> str:
+    """
+    One text completion on the async client, with quota backoff.
+    Each attempt goes through hedge_policy (enabled with GEMINI_HEDGE=1) and
+    holds a host-wide "net" slot; a hedged duplicate shares its primary's slot.
+    """
+    client = get_client()
+    config = {"temperature": temperature} if temperature is not None else None
+    hedge_key = (model, size_bucket(len(prompt)))
+
+    async def attempt():
+        async with astage_slot("net"):
+            return await hedge_policy.call(hedge_key, lambda: client.aio.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=config,
+            ))
+
+    resp = await with_quota_backoff(attempt)
+    return resp.text
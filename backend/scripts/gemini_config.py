@@ -3,77 +3,82 @@ import re
 import json
 import asyncio
 import tempfile
-from typing import List, Dict
-import time
-from google.genai.errors import ClientError
-import fitz  # PyMuPDF
-from google import genai
-from dotenv import load_dotenv
-
-load_dotenv()
-
+from collections import deque
+from typing import List, Dict, Iterable
+
+import env  # noqa: F401  (loads backend/.env)
+from gemini_client import generate_text
+from model_router import router
+from pdf_text import iter_page_texts, chunk_lines
+from stage_limits import run_cpu
 from voice import (
     tts_edge_single_speaker,
     merge_mp3_files,
     tts_gemini_multi_speaker,
 )
 
-# ---------- Gemini client setup ----------
-# Allow either GEMINI_API_KEY or GOOGLE_API_KEY
-if "GOOGLE_API_KEY" not in os.environ:
-    raise EnvironmentError("GOOGLE_API_KEY not found in environment variables.")
-
-# Initialize Gemini client
-client = genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
-
 # ---------- Text generation helper ----------
+# Requests share the pooled client from gemini_client so one event loop can
+# overlap many network waits.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+async def _gen_model_text(prompt, phase="summarize", temperature=0.5):
+    # The model is chosen per phase by model_router
+    return await generate_text(prompt, model=router.route(phase, prompt), temperature=temperature)
 
-def _gen_model_text(prompt, model="gemini-2.5-flash", temperature=0.5):
+async def _iter_in_thread(items: Iterable):
+    """
+    Async iteration over a blocking iterator (e.g. streamed PDF extraction):
+    each item is produced in a worker thread holding a cpu slot, so in-flight
+    requests keep running while the next page is read.
+    """
+    it, done = iter(items), object()
     while True:
-        try:
-            resp = client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config={"temperature": temperature}
-            )
-            return resp.text
-        except ClientError as e:
-            if "RESOURCE_EXHAUSTED" in str(e):
-                print("Quota hit, waiting 10s before retry...")
-                time.sleep(10)
-            else:
-                raise
+        item = await run_cpu(next, it, done)
+        if item is done:
+            return
+        yield item
+
+async def _map_bounded(fn, items, limit: int) -> list:
+    """
+    Await fn(item) for every item of a sync or async iterable with at most
+    `limit` in flight; keeps input order.
+    """
+    results, pending = [], deque()
+
+    async def submit(item) -> None:
+        pending.append(asyncio.ensure_future(fn(item)))
+        if len(pending) >= limit:
+            results.append(await pending.popleft())
+
+    try:
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await submit(item)
+        else:
+            for item in items:
+                await submit(item)
+        while pending:
+            results.append(await pending.popleft())
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    return results
 
 
 # ---------- PDF -> text ----------
-def extract_text_from_pdf(pdf_path: str) -> str:
-    doc = fitz.open(pdf_path)
-    pages = []
-    for page in doc:
-        pages.append(page.get_text())
-    return "\n".join(pages)
+def extract_text_from_pdf(pdf_path) -> str:
+    # pdf_path may also be an already opened fitz document (shared by combined jobs)
+    return "\n".join(iter_page_texts(pdf_path))
 
 # ---------- chunk ----------
 def split_into_chunks(text: str, max_chars: int = 3000) -> List[str]:
-    lines = text.splitlines()
-    chunks, cur = [], []
-    cur_len = 0
-    for ln in lines:
-        add = len(ln) + 1
-        if cur_len + add > max_chars and cur:
-            chunks.append("\n".join(cur))
-            cur, cur_len = [ln], add
-        else:
-            cur.append(ln)
-            cur_len += add
-    if cur:
-        chunks.append("\n".join(cur))
-    return chunks
+    return list(chunk_lines(text.splitlines(), max_chars))
 
 # ---------- summarize ----------
-def summarize_chunks(chunks: List[str]) -> str:
-    summaries = []
-    for chunk in chunks:
+async def summarize_chunks(chunks: Iterable[str]) -> str:
+    async def summarize(chunk: str) -> str:
         prompt = f"""
 You are an expert science communicator explaining research papers to an educated but non-specialist audience.
 Read the following section of a paper and create a teaching-style summary:
@@ -85,7 +90,10 @@ Read the following section of a paper and create a teaching-style summary:
 SECTION:
 {chunk}
 """
-        summaries.append(_gen_model_text(prompt, model="gemini-2.5-flash", temperature=0.5))
+        return await _gen_model_text(prompt, phase="summarize", temperature=0.5)
+
+    # Chunks are pulled off the event loop: extraction must not stall pending summaries
+    summaries = await _map_bounded(summarize, _iter_in_thread(chunks), LLM_CONCURRENCY)
 
     combined = " ".join(summaries)
 
@@ -99,7 +107,7 @@ Write it as if preparing detailed notes for a podcast discussion:
 SUMMARIES:
 {combined}
 """
-    return _gen_model_text(compress_prompt, model="gemini-2.5-flash", temperature=0.4)
+    return await _gen_model_text(compress_prompt, phase="summary_merge", temperature=0.4)
 
 # ---------- conversation JSON ----------
 CONVO_PROMPT_TEMPLATE = """
@@ -134,9 +142,9 @@ def _try_parse_json_array(s: str) -> List[Dict[str, str]]:
         raise ValueError("No valid items found.")
     return out
 
-def build_conversation_json(summary: str) -> List[Dict[str, str]]:
+async def build_conversation_json(summary: str) -> List[Dict[str, str]]:
     # 1st attempt
-    raw = _gen_model_text(CONVO_PROMPT_TEMPLATE.format(summary=summary), model="gemini-2.5-flash", temperature=0.5)
+    raw = await _gen_model_text(CONVO_PROMPT_TEMPLATE.format(summary=summary), phase="conversation", temperature=0.5)
     try:
         return _try_parse_json_array(raw)
     except Exception:
@@ -161,7 +169,7 @@ No commentary. No Markdown. Just the JSON array.
 INPUT:
 {raw}
 """
-    repaired = _gen_model_text(repair_prompt, model="gemini-2.5-flash", temperature=0.0)
+    repaired = await _gen_model_text(repair_prompt, phase="conversation_repair", temperature=0.0)
     return _try_parse_json_array(repaired)
 
 def save_conversation_json(conversation: List[Dict[str, str]], json_path: str) -> None:
@@ -170,50 +178,64 @@ def save_conversation_json(conversation: List[Dict[str, str]], json_path: str) -
         json.dump(conversation, f, ensure_ascii=False, indent=2)
 
 # ---------- audio generation ----------
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+
 async def generate_low_quality_audio(conversation: List[Dict[str, str]],
                                      Alex_voice_label: str,
                                      Avery_voice_label: str,
-                                     output_mp3_path: str) -> None:
+                                     output_mp3_path: str,
+                                     segment_dir: str = None) -> None:
     """
     Low-quality path:
     - Make one MP3 per dialogue line (speaker speaks ONLY their text).
     - Merge into a single MP3.
+    With segment_dir (a checkpoint directory), finished segments are kept there
+    and reused by a resumed run instead of being synthesized again.
     """
-    tmpdir = tempfile.mkdtemp(prefix="podcast_segments_")
-    seg_paths: List[str] = []
+    keep_segments = segment_dir is not None
+    tmpdir = segment_dir if keep_segments else tempfile.mkdtemp(prefix="podcast_segments_")
+    seg_paths: List[str] = [os.path.join(tmpdir, f"seg_{idx:04d}.mp3")
+                            for idx in range(1, len(conversation) + 1)]
     try:
-        idx = 1
-        for turn in conversation:
-            speaker = turn["speaker"]
-            text = turn["text"]
-            voice_label = Alex_voice_label if speaker == "Alex" else Avery_voice_label
-            seg_path = os.path.join(tmpdir, f"seg_{idx:04d}.mp3")
-            await tts_edge_single_speaker(text, voice_label, seg_path)
-            seg_paths.append(seg_path)
-            idx += 1
-
-        merge_mp3_files(seg_paths, output_mp3_path)
+        async def synthesize(i: int) -> None:
+            if keep_segments and os.path.exists(seg_paths[i]):
+                return
+            turn = conversation[i]
+            voice_label = Alex_voice_label if turn["speaker"] == "Alex" else Avery_voice_label
+            # Write under a temporary name so an interrupted segment is never reused
+            part_path = seg_paths[i] + ".part"
+            await tts_edge_single_speaker(turn["text"], voice_label, part_path)
+            os.replace(part_path, seg_paths[i])
+
+        # Segments are independent network calls; merging keeps the dialogue order
+        await _map_bounded(synthesize, range(len(conversation)), TTS_CONCURRENCY)
+
+        await run_cpu(merge_mp3_files, seg_paths, output_mp3_path)
     finally:
-        # clean temp files
-        for p in seg_paths:
+        if not keep_segments:
+            # clean temp files
+            for p in seg_paths:
+                for path in (p, p + ".part"):
+                    try:
+                        os.remove(path)
+                    except Exception:
+                        pass
             try:
-                os.remove(p)
+                os.rmdir(tmpdir)
             except Exception:
                 pass
-        try:
-            os.rmdir(tmpdir)
-        except Exception:
-            pass
 
 async def generate_audio_high(conversation: List[Dict[str, str]],
                               Alex_voice_label: str,
                               Avery_voice_label: str,
-                              output_wav_path: str) -> None:
+                              output_path: str,
+                              pcm_cache_path: str = None) -> None:
     """
     High-quality path (Gemini multi-speaker, single shot):
     - Build 'Alex: ...\\nAvery: ...' transcript (labels route to correct voice).
-    - Produce a WAV at output_wav_path.
-    NOTE: Ensure your Node layer passes a '.wav' path for high quality.
+    - Encode to output_path; the extension picks the format (.mp3, .ogg/.opus, .wav).
+    pcm_cache_path checkpoints the synthesized PCM so a failed encode can resume.
     """
     convo_text = "\n".join(f"{turn['speaker']}: {turn['text']}" for turn in conversation)
-    await tts_gemini_multi_speaker(convo_text, Alex_voice_label, Avery_voice_label, output_wav_path)
\ No newline at end of file
+    await tts_gemini_multi_speaker(convo_text, Alex_voice_label, Avery_voice_label, output_path,
+                                   pcm_cache_path=pcm_cache_path)
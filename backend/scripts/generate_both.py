@@ -0,0 +1,111 @@
+import os
+import sys
+import asyncio
+
+import fitz  # PyMuPDF
+
+from checkpoints import CheckpointStore, pop_resume_flag
+from gemini_config import (
+    extract_text_from_pdf,
+    build_conversation_json,
+    save_conversation_json,
+    generate_low_quality_audio,
+    generate_audio_high,
+)
+from memory_guard import profiler
+from model_router import router
+from stage_limits import run_cpu
+from ppt_gen import (
+    PPT_PHASES,
+    get_template_path,
+    preprocess_text,
+    build_slide_data,
+    make_ppt_from_data,
+)
+
+
+async def run_pipeline(pdf_path: str,
+                       pptx_output_path: str,
+                       podcast_output_path: str,
+                       template_number: str,
+                       length_of_ppt: str,
+                       Alex_voice: str,
+                       Avery_voice: str,
+                       quality: str,
+                       store: CheckpointStore = None) -> None:
+    """
+    Presentation + podcast from one extraction and one structuring pass.
+    The Phase 2 structured text replaces summarize_chunks as the podcast source.
+    """
+    template_path = get_template_path(template_number)
+    store = store or CheckpointStore()
+    router.plan(["structure", "conversation", "conversation_repair"] + PPT_PHASES[1:])
+
+    # 1) Extract once; the open document is reused for figure extraction
+    doc = fitz.open(pdf_path)
+
+    # 2) Shared structured representation of the paper
+    async def extract_and_preprocess():
+        paper_text = await run_cpu(extract_text_from_pdf, doc)
+        print("\nPhase-1: Text Extraction is completed\n")
+        return await preprocess_text(paper_text, length_of_ppt)
+
+    with profiler.phase("preprocessed_text"):
+        pre_process_text = await store.run("preprocessed_text", extract_and_preprocess)
+    print("\nPhase-2: Text Processing Completed \n")
+
+    # 3) Conversation and slide JSON are independent once the structure exists
+    async def conversation_phase():
+        with profiler.phase("conversation"):
+            return await store.run("conversation", build_conversation_json, pre_process_text)
+
+    conversation, _ = await asyncio.gather(
+        conversation_phase(),
+        build_slide_data(doc, pre_process_text, template_path, store),
+    )
+
+    base, ext = os.path.splitext(podcast_output_path)
+    save_conversation_json(conversation, base + ".conversation.json")
+
+    # 4) Audio synthesis and slide rendering in parallel
+    if quality == "low":
+        audio = generate_low_quality_audio(conversation, Alex_voice, Avery_voice, podcast_output_path,
+                                           segment_dir=store.phase_dir("segments"))
+    else:
+        tts_dir = store.phase_dir("tts")
+        audio = generate_audio_high(conversation, Alex_voice, Avery_voice, podcast_output_path,
+                                    pcm_cache_path=os.path.join(tts_dir, "audio.pcm") if tts_dir else None)
+    with profiler.phase("audio_and_render_pptx"):
+        await asyncio.gather(
+            audio,
+            run_cpu(make_ppt_from_data, template_path, pptx_output_path),
+        )
+    print(f"[OK] Podcast created at: {podcast_output_path}")
+    store.clear()
+
+
+def main():
+    resume = pop_resume_flag(sys.argv)
+    if len(sys.argv) != 9:
+        print("Usage: generate_both.py <pdf_path> <pptx_output_path> <podcast_output_path> "
+              "<template_number> <length> <AlexVoice> <AveryVoice> <quality> [--resume]")
+        sys.exit(1)
+
+    (pdf_path, pptx_output_path, podcast_output_path, template_number,
+     length_of_ppt, Alex_voice, Avery_voice, quality) = sys.argv[1:9]
+    quality = quality.lower().strip()
+    if quality not in ("low", "high"):
+        print("Error: <quality> must be 'low' or 'high'")
+        sys.exit(1)
+
+    store = CheckpointStore.for_job(pdf_path, {
+        "job": "both", "template": template_number, "length": length_of_ppt,
+        "voices": [Alex_voice, Avery_voice], "quality": quality,
+    }, resume=resume)
+
+    asyncio.run(run_pipeline(pdf_path, pptx_output_path, podcast_output_path, template_number,
+                             length_of_ppt, Alex_voice, Avery_voice, quality, store))
+
+
+if __name__ == "__main__":
+    main()
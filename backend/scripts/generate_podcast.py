@@ -2,9 +2,11 @@ import os
 import sys
 import asyncio
 
+from checkpoints import CheckpointStore, pop_resume_flag
+from memory_guard import profiler
+from model_router import router
+from pdf_text import iter_pdf_chunks
 from gemini_config import (
-    extract_text_from_pdf,
-    split_into_chunks,
     summarize_chunks,
     build_conversation_json,
     save_conversation_json,
@@ -12,26 +14,21 @@ from gemini_config import (
     generate_audio_high,
 )
 
-def main():
-    if len(sys.argv) != 6:
-        print("Usage: generate_podcast.py <pdf_path> <output_path> <AlexVoice> <AveryVoice> <quality>")
-        sys.exit(1)
-
-    pdf_path, output_path, Alex_voice, Avery_voice, quality = sys.argv[1:6]
-    print(sys.argv[1:6])
-    quality = quality.lower().strip()
-
-    # 1) Extract
-    paper_text = extract_text_from_pdf(pdf_path)
+async def run_pipeline(pdf_path: str, output_path: str, Alex_voice: str, Avery_voice: str, quality: str,
+                       store: CheckpointStore = None) -> None:
+    store = store or CheckpointStore()
+    router.plan(["summarize", "summary_merge", "conversation", "conversation_repair"])
 
-    # 2) Chunk
-    chunks = split_into_chunks(paper_text, max_chars=3000)
+    # 1-2) Extract and chunk, streamed page by page (only read if the summary is not checkpointed)
+    chunks = iter_pdf_chunks(pdf_path, max_chars=3000)
 
     # 3) Summarize with Gemini 2.5 Flash
-    summary = summarize_chunks(chunks)
+    with profiler.phase("summary"):
+        summary = await store.run("summary", summarize_chunks, chunks)
 
     # 4) Build strict JSON conversation (Alex/Avery alternating)
-    conversation = build_conversation_json(summary)
+    with profiler.phase("conversation"):
+        conversation = await store.run("conversation", build_conversation_json, summary)
 
     # 5) Save conversation.json next to output file
     base, ext = os.path.splitext(output_path)
@@ -41,19 +38,39 @@ def main():
     # 6) Audio
     if quality == "low":
         # MP3
-        asyncio.run(generate_low_quality_audio(conversation, Alex_voice, Avery_voice, output_path))
+        with profiler.phase("audio"):
+            await generate_low_quality_audio(conversation, Alex_voice, Avery_voice, output_path,
+                                             segment_dir=store.phase_dir("segments"))
         print(f"[OK] Low quality MP3 created at: {output_path}")
-    elif quality == "high":
-        # WAV (please pass a '.wav' path from Node for correctness)
-        if not output_path.lower().endswith(".wav"):
-            # We still write WAV bytes to the given path to avoid breaking your pipeline.
-            # For best results, pass a .wav filename for high quality.
-            print("[WARN] High quality expects .wav output. Writing WAV bytes to the provided path anyway.")
-        asyncio.run(generate_audio_high(conversation, Alex_voice, Avery_voice, output_path))
-        print(f"[OK] High quality WAV created at: {output_path}")
     else:
+        # Encoded from Gemini PCM; format follows the extension (.mp3, .ogg/.opus, .wav)
+        tts_dir = store.phase_dir("tts")
+        with profiler.phase("audio"):
+            await generate_audio_high(conversation, Alex_voice, Avery_voice, output_path,
+                                      pcm_cache_path=os.path.join(tts_dir, "audio.pcm") if tts_dir else None)
+        print(f"[OK] High quality {ext.lstrip('.').upper()} created at: {output_path}")
+
+    store.clear()
+
+def main():
+    resume = pop_resume_flag(sys.argv)
+    if len(sys.argv) != 6:
+        print("Usage: generate_podcast.py <pdf_path> <output_path> <AlexVoice> <AveryVoice> <quality> [--resume]")
+        sys.exit(1)
+
+    pdf_path, output_path, Alex_voice, Avery_voice, quality = sys.argv[1:6]
+    print(sys.argv[1:6])
+    quality = quality.lower().strip()
+    if quality not in ("low", "high"):
         print("Error: <quality> must be 'low' or 'high'")
         sys.exit(1)
 
+    store = CheckpointStore.for_job(
+        pdf_path, {"job": "podcast", "voices": [Alex_voice, Avery_voice], "quality": quality}, resume=resume
+    )
+
+    # One event loop for the whole job: LLM and TTS calls never block it
+    asyncio.run(run_pipeline(pdf_path, output_path, Alex_voice, Avery_voice, quality, store))
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import contextmanager
+
+import env  # noqa: F401  (loads backend/.env)
+from stage_limits import STAGE_LOCK_DIR
+
+# ---------- Hedged requests ----------
+# When a request has not returned within a percentile of recently observed
+# latency for the same model and prompt size, a duplicate is sent and the
+# first successful response wins. A token bucket caps duplicates: every request
+# earns GEMINI_HEDGE_BUDGET of a token, a hedge spends one, and the bucket never
+# holds more than GEMINI_HEDGE_BURST, so unused allowance does not pile up.
+# Every pipeline process runs a single job, so the latency samples and the
+# budget are kept host-wide in HEDGE_STATE_FILE (a JSON file updated under an
+# flock) rather than per process.
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE") == "1"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "5"))
+# Used until enough samples exist for a (model, size) bucket
+GEMINI_HEDGE_DEFAULT_DELAY_S = float(os.getenv("GEMINI_HEDGE_DEFAULT_DELAY_S", "90"))
+# Tokens earned per request, and the most the host-wide bucket can hold
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.1"))
+GEMINI_HEDGE_BURST = int(os.getenv("GEMINI_HEDGE_BURST", "2"))
+HEDGE_STATE_FILE = os.getenv("HEDGE_STATE_FILE") or os.path.join(STAGE_LOCK_DIR, "hedge_state.json")
+LATENCY_WINDOW = 50
+
+
+def size_bucket(prompt_chars: int) -> int:
+    """Prompt size class: 0 for < 1k chars, then one bucket per doubling."""
+    return (prompt_chars // 1000).bit_length()
+
+
+class SharedState:
+    """
+    A small JSON document shared by every process on the host (path=None keeps
+    it in this process only). Updates are read-modify-write under an flock.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._local = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        import fcntl
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def read(self) -> dict:
+        if not self.path:
+            return self._local
+        with self._locked(exclusive=False):
+            return self._load()
+
+    @contextmanager
+    def update(self):
+        if not self.path:
+            yield self._local
+            return
+        with self._locked(exclusive=True):
+            state = self._load()
+            yield state
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+
+
+def _key_name(key) -> str:
+    return "|".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+
+class LatencyTracker:
+    """Recent successful request latencies per key, shared through `state`."""
+
+    def __init__(self, state: SharedState, window: int = LATENCY_WINDOW):
+        self.state = state
+        self.window = window
+
+    def record(self, key, seconds: float) -> None:
+        with self.state.update() as state:
+            samples = state.setdefault("latency", {}).setdefault(_key_name(key), [])
+            samples.append(round(seconds, 3))
+            del samples[:-self.window]
+
+    def percentile(self, key, pct: float, min_samples: int = 1):
+        samples = sorted(self.state.read().get("latency", {}).get(_key_name(key), ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+
+class HedgeBudget:
+    """
+    Token bucket shared through `state`: each request adds `ratio` tokens, up
+    to `burst`; each hedge takes one. Starts full.
+    """
+
+    def __init__(self, ratio: float, burst: int, state: SharedState):
+        self.ratio = ratio
+        self.burst = burst
+        self.state = state
+
+    def _tokens(self, state: dict) -> float:
+        return min(float(state.get("hedge_tokens", self.burst)), self.burst)
+
+    def note_request(self) -> None:
+        with self.state.update() as state:
+            state["hedge_tokens"] = round(min(self._tokens(state) + self.ratio, self.burst), 6)
+
+    def try_acquire(self) -> bool:
+        with self.state.update() as state:
+            tokens = self._tokens(state)
+            if tokens < 1:
+                return False
+            state["hedge_tokens"] = round(tokens - 1, 6)
+            return True
+
+
+class HedgePolicy:
+    def __init__(self, enabled: bool = GEMINI_HEDGE,
+                 percentile: float = GEMINI_HEDGE_PERCENTILE,
+                 min_samples: int = GEMINI_HEDGE_MIN_SAMPLES,
+                 default_delay_s: float = GEMINI_HEDGE_DEFAULT_DELAY_S,
+                 state: SharedState = None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay_s = default_delay_s
+        state = state or SharedState(HEDGE_STATE_FILE)
+        self.budget = HedgeBudget(GEMINI_HEDGE_BUDGET, GEMINI_HEDGE_BURST, state)
+        self.latency = LatencyTracker(state)
+
+    def delay_for(self, key) -> float:
+        observed = self.latency.percentile(key, self.percentile, self.min_samples)
+        return observed if observed is not None else self.default_delay_s
+
+    async def _timed(self, key, make_request):
+        started = time.monotonic()
+        result = await make_request()
+        self.latency.record(key, time.monotonic() - started)
+        return result
+
+    async def call(self, key, make_request):
+        """
+        Await make_request() (a zero-argument coroutine factory), hedging it
+        with one duplicate if it is slow and the budget allows.
+        """
+        primary = asyncio.ensure_future(self._timed(key, make_request))
+        if not self.enabled:
+            return await primary
+        self.budget.note_request()
+
+        delay = self.delay_for(key)
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.budget.try_acquire():
+            return await primary
+
+        print(f"[hedge] {key[0]} request still pending after {delay:.1f}s; sending a duplicate")
+        pending = {primary, asyncio.ensure_future(self._timed(key, make_request))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Policy used by every Gemini text call; its samples and budget are host-wide
+hedge_policy = HedgePolicy()
@@ -0,0 +1,348 @@
+"""
+Concurrent-load test for the pipeline scripts against local stand-ins.
+
+Starts a stand-in Gemini server (text and TTS, log-normal latency, injected
+429 RESOURCE_EXHAUSTED errors) reached through GEMINI_BASE_URL, puts a
+stand-in edge_tts package on PYTHONPATH, then runs the real pipeline scripts
+at each concurrency level. Reports jobs/min, p50/p95/p99 job and per-phase
+latency, CPU and memory use, and the level where throughput stops scaling.
+
+Usage: python loadtest.py --pdf paper.pdf [--type podcast] [--levels 1,2,4,8]
+       python loadtest.py --serve-only   (just the Gemini stand-in)
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import base64
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STUBS_DIR = os.path.join(SCRIPTS_DIR, "loadtest_stubs")
+
+PCM_RATE = 24000  # 16-bit mono, as returned by the Gemini TTS model
+WORDS_PER_S = 2.5
+MB = 1024 * 1024
+
+
+# ---------- Gemini stand-in ----------
+def _stand_in_text(prompt: str) -> str:
+    """A response each pipeline phase can parse, picked by the prompt's wording."""
+    if "JSON array of objects" in prompt or "STRICT JSON array where each element" in prompt:
+        turns = [{"speaker": "Alex" if i % 2 == 0 else "Avery",
+                  "text": f"Here is point {i + 1} of the discussion about the paper's methods and results."}
+                 for i in range(12)]
+        return json.dumps(turns)
+    if "map each slide to a suitable layout" in prompt:
+        slides = [{"slide_title": f"Slide {i + 1}", "bullet_points": ["First point.", "Second point."],
+                   "image_path": "null", "layout_index": 0 if i == 0 else 1,
+                   "placeholders": {"title": 0, "content": 1}} for i in range(6)]
+        return "```json\n" + json.dumps(slides) + "\n```"
+    if "structured JSON array representing" in prompt:
+        slides = [{"slide_title": f"Slide {i + 1}", "content_type": "bullet_points",
+                   "bullet_points": ["First point.", "Second point."], "image_path": "null"} for i in range(6)]
+        return "```json\n" + json.dumps(slides) + "\n```"
+    if "figure caption extractor" in prompt:
+        return "\n\n".join(f"Figure {i}\nA stand-in caption for figure {i}." for i in range(1, 5))
+    sentence = "The paper studies a problem, proposes a method and reports results. "
+    return "## Section: Overview\n" + sentence * 20
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        m = re.search(r"models/([^/:]+):generateContent", self.path)
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not m:
+            return self._reply(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+        model = m.group(1)
+        request = json.loads(raw or b"{}")
+        prompt = "".join(part.get("text", "") for content in request.get("contents", [])
+                         for part in content.get("parts", []))
+        tts = "tts" in model
+
+        with server.lock:
+            server.counts["requests"] += 1
+            quota_error = server.rng.random() < server.quota_error_rate
+            delay = server.rng.lognormvariate(
+                math.log((server.tts_latency_ms if tts else server.llm_latency_ms) / 1000), server.sigma)
+        if quota_error:
+            with server.lock:
+                server.counts["quota_errors"] += 1
+            return self._reply(429, {"error": {"code": 429, "message": "Resource has been exhausted (stand-in)",
+                                               "status": "RESOURCE_EXHAUSTED"}})
+        time.sleep(delay)
+
+        if tts:
+            seconds = max(1.0, len(prompt.split()) / WORDS_PER_S)
+            pcm = b"\x00\x00" * int(seconds * PCM_RATE)
+            part = {"inlineData": {"mimeType": f"audio/L16;codec=pcm;rate={PCM_RATE}",
+                                   "data": base64.b64encode(pcm).decode("ascii")}}
+        else:
+            part = {"text": _stand_in_text(prompt)}
+        self._reply(200, {
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4},
+            "modelVersion": model,
+        })
+
+
+class StandInGemini(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, llm_latency_ms=2000.0, tts_latency_ms=4000.0, sigma=0.5,
+                 quota_error_rate=0.0, seed=None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.llm_latency_ms = llm_latency_ms
+        self.tts_latency_ms = tts_latency_ms
+        self.sigma = sigma
+        self.quota_error_rate = quota_error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def take_counts(self) -> Counter:
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+
+# ---------- Jobs ----------
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _job_command(args, job_dir: str):
+    pdf = os.path.abspath(args.pdf)
+    pptx = os.path.join(job_dir, "out.pptx")
+    podcast = os.path.join(job_dir, "out.mp3")
+    if args.type == "presentation":
+        script, rest = "ppt_gen.py", [pdf, pptx, args.template, args.length]
+    elif args.type == "podcast":
+        script, rest = "generate_podcast.py", [pdf, podcast, "Kore", "Puck", args.quality]
+    else:
+        script, rest = "generate_both.py", [pdf, pptx, podcast, args.template, args.length, "Kore", "Puck",
+                                            args.quality]
+    return [sys.executable, os.path.join(SCRIPTS_DIR, script)] + rest
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def run_level(args, server: StandInGemini, workdir: str, concurrency: int) -> dict:
+    """Run concurrency * rounds jobs, at most `concurrency` at a time."""
+    level_dir = os.path.join(workdir, f"c{concurrency}")
+    live = set()
+    live_lock = threading.Lock()
+    peak_total_rss = 0
+    stop = threading.Event()
+
+    def sample_memory():
+        nonlocal peak_total_rss
+        while not stop.wait(0.5):
+            with live_lock:
+                pids = list(live)
+            peak_total_rss = max(peak_total_rss, sum(_rss_bytes(pid) for pid in pids))
+
+    def run_job(i: int) -> dict:
+        job_dir = os.path.join(level_dir, f"job{i:03d}")
+        os.makedirs(job_dir)
+        env = dict(os.environ)
+        env.update({
+            "GEMINI_BASE_URL": server.base_url,
+            "GOOGLE_API_KEY": "loadtest",
+            "PYTHONPATH": os.pathsep.join(p for p in (STUBS_DIR, SCRIPTS_DIR, env.get("PYTHONPATH")) if p),
+            "PIPELINE_METRICS_FILE": os.path.join(job_dir, "metrics.json"),
+            "CHECKPOINT_DIR": os.path.join(job_dir, "checkpoints"),
+            "STAGE_LOCK_DIR": os.path.join(workdir, "stage-slots"),
+            "LOADTEST_TTS_LATENCY_MS": str(args.tts_latency_ms),
+            "LOADTEST_LATENCY_SIGMA": str(args.latency_sigma),
+        })
+        started = time.monotonic()
+        with open(os.path.join(job_dir, "output.log"), "w") as log:
+            # Each job gets its own working directory: the scripts write images/ and JSON files to cwd
+            proc = subprocess.Popen(_job_command(args, job_dir), cwd=job_dir, env=env,
+                                    stdout=log, stderr=subprocess.STDOUT)
+            with live_lock:
+                live.add(proc.pid)
+            code = proc.wait()
+            with live_lock:
+                live.discard(proc.pid)
+        result = {"ok": code == 0, "seconds": time.monotonic() - started, "phases": [], "peak_rss_mb": None}
+        try:
+            with open(os.path.join(job_dir, "metrics.json"), encoding="utf-8") as f:
+                metrics = json.load(f)
+            result["phases"], result["peak_rss_mb"] = metrics["phases"], metrics["peak_rss_mb"]
+        except (OSError, ValueError, KeyError):
+            pass
+        if not result["ok"]:
+            print(f"  job {i} failed (exit {code}), see {job_dir}/output.log")
+        return result
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    server.take_counts()
+    cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_job, range(concurrency * args.rounds)))
+    wall = time.monotonic() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    stop.set()
+    sampler.join()
+    counts = server.take_counts()
+
+    cpu_s = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+    ok = [r for r in results if r["ok"]]
+    phase_seconds = defaultdict(list)
+    for r in ok:
+        for record in r["phases"]:
+            phase_seconds[record["phase"]].append(record["seconds"])
+    job_seconds = [r["seconds"] for r in ok]
+    job_rss = [r["peak_rss_mb"] for r in ok if r["peak_rss_mb"] is not None]
+    return {
+        "concurrency": concurrency,
+        "jobs": len(results),
+        "failed": len(results) - len(ok),
+        "wall_s": round(wall, 2),
+        "jobs_per_min": round(len(ok) / wall * 60, 2),
+        "job_s": {f"p{p}": percentile(job_seconds, p) for p in (50, 95, 99)},
+        "phases": {name: {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+                   for name, values in phase_seconds.items()},
+        "cpu_util": round(cpu_s / (wall * (os.cpu_count() or 1)), 3),
+        "peak_job_rss_mb": max(job_rss) if job_rss else None,
+        "peak_total_rss_mb": round(peak_total_rss / MB, 1),
+        "gemini_requests": counts["requests"],
+        "quota_errors": counts["quota_errors"],
+    }
+
+
+def find_knee(levels, min_gain: float):
+    """Last level whose next step up raised throughput by less than min_gain (relative)."""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["jobs_per_min"] < prev["jobs_per_min"] * (1 + min_gain):
+            return prev
+    return None
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_level(level: dict) -> None:
+    job = level["job_s"]
+    print(f"\nconcurrency={level['concurrency']} jobs={level['jobs']} failed={level['failed']} "
+          f"wall={level['wall_s']}s throughput={level['jobs_per_min']} jobs/min")
+    print(f"  job latency s   p50={_fmt(job['p50'])} p95={_fmt(job['p95'])} p99={_fmt(job['p99'])}")
+    for name, p in level["phases"].items():
+        print(f"  {name:<22} p50={_fmt(p['p50'])} p95={_fmt(p['p95'])} p99={_fmt(p['p99'])}")
+    print(f"  cpu={level['cpu_util'] * 100:.0f}% of {os.cpu_count()} cores  "
+          f"peak job rss={level['peak_job_rss_mb']}MB  peak total rss={level['peak_total_rss_mb']}MB  "
+          f"gemini requests={level['gemini_requests']} (429s injected: {level['quota_errors']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf", help="paper used for every job")
+    parser.add_argument("--type", choices=["presentation", "podcast", "both"], default="podcast")
+    parser.add_argument("--quality", choices=["low", "high"], default="low")
+    parser.add_argument("--template", default="1")
+    parser.add_argument("--length", default="short")
+    parser.add_argument("--levels", default="1,2,4,8", help="comma separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="jobs per level = level * rounds")
+    parser.add_argument("--llm-latency-ms", type=float, default=2000, help="median Gemini text latency")
+    parser.add_argument("--tts-latency-ms", type=float, default=4000, help="median TTS latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of latencies")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="share of Gemini calls answered 429")
+    parser.add_argument("--knee-gain", type=float, default=0.1,
+                        help="smallest relative throughput gain that still counts as scaling")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--workdir", help="keep job directories in a new run-* directory here "
+                                              "(default: temporary, removed)")
+    parser.add_argument("--json-out", help="also write the report as JSON")
+    parser.add_argument("--serve-only", action="store_true", help="only run the Gemini stand-in")
+    args = parser.parse_args()
+
+    server = StandInGemini(args.port, args.llm_latency_ms, args.tts_latency_ms, args.latency_sigma,
+                           args.quota_error_rate, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if args.serve_only:
+        print(f"Gemini stand-in on {server.base_url} (set GEMINI_BASE_URL to use it); Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+    if not args.pdf:
+        parser.error("--pdf is required unless --serve-only")
+
+    if args.workdir:
+        # A fresh run directory each time, so --workdir can be reused across runs
+        os.makedirs(args.workdir, exist_ok=True)
+        workdir = tempfile.mkdtemp(prefix=time.strftime("run-%Y%m%d-%H%M%S-"), dir=args.workdir)
+        print(f"Job directories kept in {workdir}")
+    else:
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+    levels = []
+    try:
+        for concurrency in sorted({int(c) for c in args.levels.split(",")}):
+            print(f"Running {concurrency * args.rounds} {args.type} jobs at concurrency {concurrency}...")
+            level = run_level(args, server, workdir, concurrency)
+            print_level(level)
+            levels.append(level)
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    knee = find_knee(levels, args.knee_gain)
+    if knee:
+        print(f"\nThroughput stops scaling at concurrency {knee['concurrency']} "
+              f"({knee['jobs_per_min']} jobs/min); higher levels gained < {args.knee_gain:.0%}")
+    else:
+        print(f"\nThroughput still scaling at concurrency {levels[-1]['concurrency']}; try higher --levels")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"levels": levels, "knee_concurrency": knee and knee["concurrency"]}, f, indent=2)
+    sys.exit(1 if any(level["failed"] for level in levels) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Stand-in for the edge_tts package used by loadtest.py.
+
+Put loadtest_stubs/ first on PYTHONPATH. Communicate.save() waits a
+log-normally distributed time (LOADTEST_TTS_LATENCY_MS median,
+LOADTEST_LATENCY_SIGMA spread) and writes silent MP3 frames whose length
+follows the text, so merging and encoding do realistic work.
+"""
+import os
+import math
+import random
+import asyncio
+
+TTS_LATENCY_MS = float(os.getenv("LOADTEST_TTS_LATENCY_MS", "800"))
+LATENCY_SIGMA = float(os.getenv("LOADTEST_LATENCY_SIGMA", "0.5"))
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono; zeroed side info decodes as silence
+_SILENT_FRAME = b"\xff\xfb\x90\xc0" + b"\x00" * 413
+_FRAME_S = 1152 / 44100
+_WORDS_PER_S = 2.5
+
+
+class Communicate:
+    def __init__(self, text: str, voice: str, **kwargs):
+        self.text = text
+        self.voice = voice
+
+    async def save(self, audio_fname: str) -> None:
+        await asyncio.sleep(random.lognormvariate(math.log(TTS_LATENCY_MS / 1000), LATENCY_SIGMA))
+        seconds = max(1.0, len(self.text.split()) / _WORDS_PER_S)
+        with open(audio_fname, "wb") as f:
+            f.write(_SILENT_FRAME * int(seconds / _FRAME_S))
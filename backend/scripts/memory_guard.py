@@ -0,0 +1,118 @@
+import os
+import json
+import math
+import atexit
+import time
+import resource
+import tracemalloc
+from contextlib import contextmanager
+
+import env  # noqa: F401  (loads backend/.env)
+
+# ---------- Memory instrumentation and budget ----------
+# MEMORY_PROFILE=1 records Python (tracemalloc) and process RSS peaks per
+# phase. JOB_MEMORY_BUDGET_MB caps what rendering stages may allocate: figure
+# renders drop to a lower zoom and audio merging switches to a streaming path
+# instead of running the worker out of memory.
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE") == "1"
+JOB_MEMORY_BUDGET_MB = float(os.getenv("JOB_MEMORY_BUDGET_MB", "0"))  # 0 = no budget
+# When set, phase timings (and memory fields if profiling) are written here as JSON at exit
+PIPELINE_METRICS_FILE = os.getenv("PIPELINE_METRICS_FILE") or None
+# Share of the remaining budget a single allocation may take
+ALLOCATION_SHARE = 0.5
+MIN_ZOOM = 1.0
+
+MB = 1024 * 1024
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def available_bytes():
+    """Bytes left in JOB_MEMORY_BUDGET_MB, or None when no budget is set."""
+    if JOB_MEMORY_BUDGET_MB <= 0:
+        return None
+    return max(0, int(JOB_MEMORY_BUDGET_MB * MB) - current_rss_bytes())
+
+
+def fits_budget(nbytes: int) -> bool:
+    avail = available_bytes()
+    return avail is None or nbytes <= avail * ALLOCATION_SHARE
+
+
+def fit_zoom(rect, zoom: float, channels: int = 3) -> float:
+    """
+    Largest zoom <= `zoom` whose pixmap of `rect` (plus about as much again
+    while saving) fits the memory budget. Never below MIN_ZOOM.
+    """
+    pixels_at_1 = max(rect.width, 1) * max(rect.height, 1)
+    if fits_budget(int(2 * channels * pixels_at_1 * zoom * zoom)):
+        return zoom
+    avail = available_bytes() * ALLOCATION_SHARE
+    reduced = max(MIN_ZOOM, math.floor(math.sqrt(avail / (2 * channels * pixels_at_1)) * 2) / 2)
+    reduced = min(reduced, zoom)
+    print(f"[memory] render zoom {zoom} -> {reduced} to stay within {JOB_MEMORY_BUDGET_MB:.0f} MB budget")
+    return reduced
+
+
+class PhaseProfiler:
+    """
+    Per-phase wall time and memory peaks; a no-op unless enabled.
+    With a metrics file only wall time is recorded (no tracemalloc overhead),
+    and the records are dumped there when the process exits.
+    """
+
+    def __init__(self, enabled: bool = MEMORY_PROFILE, metrics_file: str = PIPELINE_METRICS_FILE):
+        self.enabled = enabled
+        self.metrics_file = metrics_file
+        self.records = []
+        if metrics_file:
+            atexit.register(self.dump)
+
+    @contextmanager
+    def phase(self, name: str):
+        if not (self.enabled or self.metrics_file):
+            yield
+            return
+        if self.enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            record = {"phase": name, "seconds": round(time.monotonic() - started, 3)}
+            if self.enabled:
+                _, py_peak = tracemalloc.get_traced_memory()
+                record.update({
+                    "py_peak_mb": round(py_peak / MB, 1),
+                    "rss_mb": round(current_rss_bytes() / MB, 1),
+                    "peak_rss_mb": round(peak_rss_bytes() / MB, 1),
+                })
+                # Phases that overlap (e.g. in generate_both) share the process-wide peaks
+                print(f"[memory] phase={name} time={record['seconds']}s py_peak={record['py_peak_mb']}MB "
+                      f"rss={record['rss_mb']}MB peak_rss={record['peak_rss_mb']}MB")
+            self.records.append(record)
+
+    def dump(self) -> None:
+        with open(self.metrics_file, "w", encoding="utf-8") as f:
+            json.dump({"phases": self.records, "peak_rss_mb": round(peak_rss_bytes() / MB, 1)}, f, indent=2)
+
+
+# Process-wide profiler used by the pipeline scripts
+profiler = PhaseProfiler()
@@ -0,0 +1,91 @@
+import os
+import time
+
+import env  # noqa: F401  (loads backend/.env)
+from hedging import hedge_policy, size_bucket
+
+# ---------- Per-phase model routing ----------
+# Each LLM phase names its task type; the router picks the preferred model for
+# that task, uses the fast model for small inputs, and falls back to the fast
+# model when the preferred one is not expected to finish within the phase's
+# share of the remaining job latency budget. Every decision is logged.
+PRO_MODEL = os.getenv("ROUTER_PRO_MODEL", "gemini-2.5-pro")
+FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gemini-2.5-flash")
+# Seconds for the whole job; 0 disables budget-based fallback
+JOB_LATENCY_BUDGET_S = float(os.getenv("JOB_LATENCY_BUDGET_S", "0"))
+# Reasoning prompts shorter than this go to the fast model
+ROUTER_SMALL_INPUT_CHARS = int(os.getenv("ROUTER_SMALL_INPUT_CHARS", "3000"))
+
+# phase -> (task type, weight in the job budget)
+PHASES = {
+    "structure": ("reasoning", 3),
+    "figure_captions": ("extraction", 1),
+    "slides": ("reasoning", 3),
+    "layout": ("reasoning", 2),
+    "summarize": ("summary", 1),
+    "summary_merge": ("summary", 1),
+    "conversation": ("generation", 2),
+    "conversation_repair": ("extraction", 1),
+}
+TASK_MODELS = {
+    "reasoning": PRO_MODEL,
+    "generation": FAST_MODEL,
+    "summary": FAST_MODEL,
+    "extraction": FAST_MODEL,
+}
+# Cold-start latency estimate per model: seconds = base + prompt_chars / chars_per_s
+MODEL_SPEED = {
+    PRO_MODEL: (15.0, 3000.0),
+    FAST_MODEL: (4.0, 12000.0),
+}
+
+
+class ModelRouter:
+    def __init__(self, budget_s: float = JOB_LATENCY_BUDGET_S):
+        self.budget_s = budget_s
+        self.started = time.monotonic()
+        self.phase_plan = list(PHASES)
+
+    def plan(self, phases) -> None:
+        """Declare the job's phases in execution order and restart the budget clock."""
+        self.phase_plan = list(phases)
+        self.started = time.monotonic()
+
+    def estimate_s(self, model: str, prompt_chars: int) -> float:
+        observed = hedge_policy.latency.percentile((model, size_bucket(prompt_chars)), 50, min_samples=3)
+        if observed is not None:
+            return observed
+        base, chars_per_s = MODEL_SPEED.get(model, MODEL_SPEED[FAST_MODEL])
+        return base + prompt_chars / chars_per_s
+
+    def phase_allowance_s(self, phase: str):
+        """This phase's share of the remaining budget, weighted against the phases still to come."""
+        if self.budget_s <= 0:
+            return None
+        remaining = self.budget_s - (time.monotonic() - self.started)
+        weight = PHASES[phase][1]
+        later = self.phase_plan[self.phase_plan.index(phase) + 1:] if phase in self.phase_plan else []
+        return max(0.0, remaining) * weight / (weight + sum(PHASES[p][1] for p in later))
+
+    def route(self, phase: str, prompt: str) -> str:
+        task = PHASES[phase][0]
+        chars = len(prompt)
+        model = TASK_MODELS[task]
+        reason = f"{task} task"
+        if model != FAST_MODEL and chars < ROUTER_SMALL_INPUT_CHARS:
+            model, reason = FAST_MODEL, f"small input (<{ROUTER_SMALL_INPUT_CHARS} chars)"
+
+        allowance = self.phase_allowance_s(phase)
+        estimate = self.estimate_s(model, chars)
+        if allowance is not None and model != FAST_MODEL and estimate > allowance:
+            reason = f"budget: {model} est {estimate:.0f}s > allowance {allowance:.0f}s"
+            model = FAST_MODEL
+            estimate = self.estimate_s(model, chars)
+
+        budget = f", allowance {allowance:.0f}s" if allowance is not None else ""
+        print(f"[route] phase={phase} chars={chars} -> {model} ({reason}; est {estimate:.0f}s{budget})")
+        return model
+
+
+# Process-wide router; each pipeline declares its phase plan at start
+router = ModelRouter()
@@ -0,0 +1,109 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List
+
+import fitz  # PyMuPDF
+
+import env  # noqa: F401  (loads backend/.env)
+
+# ---------- Streaming PDF text extraction ----------
+# Pages are yielded as they are read so callers never need the whole document
+# text at once. Large documents can be split into page-range shards that are
+# extracted by a process pool; only a small window of shards is kept in flight.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+PDF_SHARD_MIN_PAGES = int(os.getenv("PDF_SHARD_MIN_PAGES", "200"))
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "50"))
+
+
+def _extract_shard(pdf_path: str, start: int, stop: int) -> List[str]:
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _iter_sharded(pdf_path: str, page_count: int, workers: int) -> Iterator[str]:
+    ranges = iter([(s, min(s + PDF_SHARD_PAGES, page_count))
+                   for s in range(0, page_count, PDF_SHARD_PAGES)])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        # Keep at most two shards per worker in flight to bound memory
+        for _ in range(workers * 2):
+            r = next(ranges, None)
+            if r is None:
+                break
+            pending.append(pool.submit(_extract_shard, pdf_path, *r))
+        while pending:
+            texts = pending.popleft().result()
+            r = next(ranges, None)
+            if r is not None:
+                pending.append(pool.submit(_extract_shard, pdf_path, *r))
+            yield from texts
+
+
+def iter_page_texts(pdf, workers: int = None) -> Iterator[str]:
+    """
+    Yield the text of each page in order.
+    `pdf` may be a path or an already opened fitz document. With workers > 1,
+    paths with at least PDF_SHARD_MIN_PAGES pages are extracted in parallel shards.
+    """
+    if isinstance(pdf, fitz.Document):
+        for page in pdf:
+            yield page.get_text()
+        return
+
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    doc = fitz.open(pdf)
+    page_count = len(doc)
+    if workers > 1 and page_count >= PDF_SHARD_MIN_PAGES:
+        doc.close()
+        yield from _iter_sharded(pdf, page_count, workers)
+        return
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def iter_lines(pages: Iterable[str], sep: str = "\n") -> Iterator[str]:
+    """
+    Lines of sep.join(pages), equivalent to sep.join(pages).splitlines(),
+    without building the joined string.
+    """
+    carry = ""
+    first = True
+    for page in pages:
+        buf = carry + (page if first else sep + page)
+        first = False
+        carry = ""
+        parts = buf.splitlines(keepends=True)
+        for i, part in enumerate(parts):
+            line = part.splitlines()[0]
+            if i == len(parts) - 1 and (line == part or part.endswith("\r")):
+                # Unterminated tail, or a "\r" that forms one break with a "\n"
+                # starting the separator or next page; either continues there
+                carry = part
+            else:
+                yield line
+    if carry:
+        yield carry.splitlines()[0]
+
+
+def chunk_lines(lines: Iterable[str], max_chars: int = 3000) -> Iterator[str]:
+    cur: List[str] = []
+    cur_len = 0
+    for ln in lines:
+        add = len(ln) + 1
+        if cur_len + add > max_chars and cur:
+            yield "\n".join(cur)
+            cur, cur_len = [ln], add
+        else:
+            cur.append(ln)
+            cur_len += add
+    if cur:
+        yield "\n".join(cur)
+
+
+def iter_pdf_chunks(pdf, max_chars: int = 3000, workers: int = None) -> Iterator[str]:
+    """Chunks of the document text, produced as pages are read."""
+    return chunk_lines(iter_lines(iter_page_texts(pdf, workers=workers)), max_chars)
@@ -1,35 +1,97 @@
+import io
 import sys
+import math
+import asyncio
 import json
 import os
 import re
-from pptx import Presentation
 import fitz  # PyMuPDF
-from langchain_community.document_loaders import PyMuPDFLoader
-from google import genai
-from dotenv import load_dotenv
-from pptx.util import Pt
-from PIL import Image
 
-load_dotenv()
+import env  # noqa: F401  (loads backend/.env)
+from captions import NO_CAPTION, PageTextIndex, match_captions
+from checkpoints import CheckpointStore, pop_resume_flag
+from gemini_client import generate_text
+from memory_guard import MIN_ZOOM, fit_zoom, profiler
+from model_router import router
+from pdf_text import iter_page_texts
+from stage_limits import run_cpu
 
-# -----------------------
-#  Argument handling from server.js
-# -----------------------
-if len(sys.argv) < 5:
-    print("Usage: python ppt_gen.py <pdf_path> <output_pptx_path> <template_number> <length>")
-    sys.exit(1)
+json_path = os.path.join("images", "image_captions.json")
+
+# input of pdf type i.e research paper or any standard doc
+type_pdf = "Research Paper"
 
-pdf_path = sys.argv[1]          # e.g. backend/uploads/1723648292381.pdf
-output_pptx_path = sys.argv[2]  # e.g. backend/outputs/presentation_1723648292381.pptx
-template_number = sys.argv[3]   # e.g. "1"
-length_of_ppt = sys.argv[4]     # e.g. "short" | "medium" | "long"
+# LLM phases in execution order, for the per-job latency budget in model_router
+PPT_PHASES = ["structure", "figure_captions", "slides", "layout"]
 
-# Template path inside scripts/templates
-template_path = os.path.join(os.path.dirname(__file__), "templates", f"{template_number}.pptx")
+# python-pptx and Pillow are imported where they are first needed
+
+# Figures are resampled to their on-slide size at this DPI before embedding (0 = embed as rendered)
+PPT_IMAGE_DPI = int(os.getenv("PPT_IMAGE_DPI", "150"))
+PPT_JPEG_QUALITY = int(os.getenv("PPT_JPEG_QUALITY", "85"))
+EMU_PER_INCH = 914400
+# Images with more distinct colours than this (in a thumbnail) are treated as photos
+PHOTO_MIN_COLORS = 4096
+
+# MuPDF reports failed pixmap allocations as its own errors (FzErrorBase subclasses such as
+# FzErrorLimit on PyMuPDF >= 1.24, RuntimeError before), not as Python MemoryError
+_FZ_ERROR = getattr(fitz, "FzErrorBase", None) or getattr(getattr(fitz, "mupdf", None), "FzErrorBase", None)
+PIXMAP_ERRORS = (MemoryError, RuntimeError) + ((_FZ_ERROR,) if isinstance(_FZ_ERROR, type) else ())
+
+
+def get_template_path(template_number: str) -> str:
+    # Template path inside scripts/templates
+    return os.path.join(os.path.dirname(__file__), "templates", f"{template_number}.pptx")
+
+
+def _is_slide_list(data) -> bool:
+    # Slide phases fall back to {} (or their input) when the model returns invalid JSON
+    return isinstance(data, list) and len(data) > 0 and all(isinstance(s, dict) for s in data)
 
-json_path = os.path.join("images", "image_captions.json")
 
-def make_ppt_from_data(template_path: str):
+def _strip_json_fence(text: str) -> str:
+    if text.startswith("```json"):
+        text = re.sub(r"^```json\s*|\s*```$", "", text.strip(), flags=re.MULTILINE)
+    return text
+
+
+def _encode_picture(im, width_emu: int, height_emu: int) -> bytes:
+    """
+    `im` resized to its display size at PPT_IMAGE_DPI (never upscaled) and encoded
+    as PNG, or as JPEG for opaque photo-like images when that is smaller.
+    """
+    from PIL import Image
+
+    if PPT_IMAGE_DPI > 0:
+        target = (max(1, math.ceil(width_emu / EMU_PER_INCH * PPT_IMAGE_DPI)),
+                  max(1, math.ceil(height_emu / EMU_PER_INCH * PPT_IMAGE_DPI)))
+        if target[0] < im.width and target[1] < im.height:
+            im = im.resize(target, Image.LANCZOS)
+
+    png = io.BytesIO()
+    im.save(png, format="PNG", optimize=True)
+    if im.mode not in ("RGB", "L"):
+        return png.getvalue()
+
+    thumb = im.copy()
+    thumb.thumbnail((256, 256))
+    if thumb.getcolors(PHOTO_MIN_COLORS) is not None:
+        # Few colours: charts and diagrams stay lossless
+        return png.getvalue()
+    jpeg = io.BytesIO()
+    im.save(jpeg, format="JPEG", quality=PPT_JPEG_QUALITY, optimize=True)
+    return min(png.getvalue(), jpeg.getvalue(), key=len)
+
+
+def make_ppt_from_data(template_path: str, output_pptx_path: str):
+    from pptx import Presentation
+    from pptx.util import Pt
+    from PIL import Image
+
+    # Encoded bytes per (image, display size): python-pptx stores identical image
+    # bytes as one part, so a figure reused on several slides is embedded once
+    encoded_pictures = {}
+
     pre = Presentation(template_path)
     with open("final_ppt_data.json", "r", encoding="utf-8") as f:
         slides_data = json.load(f)
@@ -103,19 +165,23 @@ def make_ppt_from_data(template_path: str):
                 ph = slide.placeholders[placeholders["image"]]
                 img_path = os.path.join("images", slide_data["image_path"])
                 ph_left, ph_top, ph_width, ph_height = ph.left, ph.top, ph.width, ph.height
-                im = Image.open(img_path)
-                img_width, img_height = im.size
-                img_ratio = img_width / img_height
-                ph_ratio = ph_width / ph_height
-                if img_ratio > ph_ratio:
-                    new_width = ph_width
-                    new_height = ph_width / img_ratio
-                else:
-                    new_height = ph_height
-                    new_width = ph_height * img_ratio
+                with Image.open(img_path) as im:
+                    img_width, img_height = im.size
+                    img_ratio = img_width / img_height
+                    ph_ratio = ph_width / ph_height
+                    if img_ratio > ph_ratio:
+                        new_width = ph_width
+                        new_height = int(ph_width / img_ratio)
+                    else:
+                        new_height = ph_height
+                        new_width = int(ph_height * img_ratio)
+                    key = (img_path, new_width, new_height)
+                    if key not in encoded_pictures:
+                        encoded_pictures[key] = _encode_picture(im, new_width, new_height)
                 left = ph_left + (ph_width - new_width) // 2
                 top = ph_top + (ph_height - new_height) // 2
-                slide.shapes.add_picture(img_path, left, top, width=new_width, height=new_height)
+                slide.shapes.add_picture(io.BytesIO(encoded_pictures[key]), left, top,
+                                         width=new_width, height=new_height)
             except Exception as e:
                 print(f" Image not inserted on slide '{slide_data['slide_title']}': {e}")
 
@@ -158,8 +224,9 @@ def group_image_bboxes(image_bboxes, y_tol=80, x_gap_tol=100):
 
 
 
-def extract_combined_images_with_captions(file_path: str):
-    pdf_file = fitz.open(file_path)
+def extract_combined_images_with_captions(file_path):
+    # Accepts a path or an already opened document so callers can parse the PDF once
+    pdf_file = file_path if isinstance(file_path, fitz.Document) else fitz.open(file_path)
     os.makedirs("images", exist_ok=True)
     image_caption_map = {}
     image_id = 1  # to name images like image1.png, image2.png ...
@@ -181,6 +248,9 @@ def extract_combined_images_with_captions(file_path: str):
         # Step 2: Group images that are side-by-side
         groups = group_image_bboxes(bboxes)
 
+        # Page text blocks are indexed once, on the first group that needs a caption
+        text_index = None
+
         for group in groups:
             # Step 3: Merge bounding box of grouped images
             merged_bbox = fitz.Rect(
@@ -190,38 +260,29 @@ def extract_combined_images_with_captions(file_path: str):
                 max(b.y1 for b in group),
             )
 
-            # Step 4: Extract combined image as pixmap
-            zoom = 10
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, clip=merged_bbox)
+            # Step 4: Extract combined image as pixmap (zoom lowered to fit JOB_MEMORY_BUDGET_MB)
+            zoom = fit_zoom(merged_bbox, 10)
+            pix = None
+            while pix is None:
+                try:
+                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=merged_bbox)
+                except PIXMAP_ERRORS as e:
+                    if zoom <= MIN_ZOOM:
+                        print(f"[memory] skipping figure on page {page_index + 1}: render failed at zoom {zoom}: {e}")
+                        break
+                    zoom = max(MIN_ZOOM, zoom / 2)
+                    print(f"[memory] pixmap render failed ({e}); retrying at zoom {zoom}")
+            if pix is None:
+                continue
 
             image_filename = f"image{image_id}.png"
             image_path = os.path.join("images", image_filename)
             pix.save(image_path)
 
-            # Step 5: Extract caption just below the image group
-            caption_area = fitz.Rect(
-                merged_bbox.x0 - 300,
-                merged_bbox.y1,
-                merged_bbox.x1 + 300,
-                merged_bbox.y1 + 400,  # Area below image to search for caption
-            )
-            caption_text = page.get_textbox(caption_area).strip()
-
-            # Find "Figure X: ..." using regex
-            figure_match = re.search(
-                r"(?:Figure|Fig\.)\s?\d+\s?:\s?.+",
-                caption_text,
-                re.IGNORECASE,
-            )
-
-           
-
-            figure_caption = (
-                figure_match.group(0).strip()
-                if figure_match
-                else "No Figure caption found"
-            )
+            # Step 5: Nearest "Figure N" text block below the image group
+            if text_index is None:
+                text_index = PageTextIndex(page)
+            figure_caption = text_index.caption_below(merged_bbox) or NO_CAPTION
 
             # Step 6: Save mapping
             image_caption_map[image_filename] = figure_caption
@@ -241,22 +302,15 @@ def extract_combined_images_with_captions(file_path: str):
 
 #  Phase -1 Data extraction from the ppt //////////////////////////////////////////////////
 
+def extract_text(pdf_path: str) -> str:
+    # Same page concatenation PyMuPDFLoader produced, without its per-page Document copies
+    return "".join(iter_page_texts(pdf_path))
 
-loader = PyMuPDFLoader(pdf_path)
-docs = loader.load()
-text = "".join(doc.page_content for doc in docs)
 
-print("\nPhase-1: Text Extraction is completed\n")
 # Phase -2 Take the extracted data and generate a ppt text for according to pages /////////////////////////////////////////////////////////////////////////
 
-# type_pdf = input("\n.....Enter the pdf type... \n" )
-type_pdf = "Research Paper"
-# input of pdf type i.e research paper or any standard doc
-
-
-# length_of_ppt = input("\n..Enter the lenght of ppt means short / medium / long..\n")
-
-system_prompt_1 = f"""
+async def preprocess_text(text: str, length_of_ppt: str) -> str:
+    system_prompt_1 = f"""
 
 
 You are a smart document structuring assistant. Your task is to take the complete extracted text from a PDF file and preprocess it in a way that it becomes well-organized, logically grouped, and ready for PowerPoint slide generation in the next phase.
@@ -304,33 +358,16 @@ Now process the content accordingly.
 
 """
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-client = genai.Client(api_key=GOOGLE_API_KEY)
+    return await generate_text(system_prompt_1, model=router.route("structure", system_prompt_1))
 
-response = client.models.generate_content(
-    model="gemini-2.5-pro",
-    contents=system_prompt_1,
-)
 
-# print(response.text)
-
-
-pre_process_text = response.text
-print("\nPhase-2: Text Processing Completed \n")
-
-
-# Phase -3 from the pdf find the images /////////////////////////////
-
-
-extract_combined_images_with_captions(pdf_path)
-
-print("\nPhase-3: Retreive the Images from the Given PDF\n")
+# Phase -3 from the pdf find the images is extract_combined_images_with_captions above
 
 
 # Phase -4 from the text find all the figure_captions ////////////////////////////////////
 
-
-system_prompt_2 = f"""
+async def extract_figure_captions(pre_process_text: str) -> str:
+    system_prompt_2 = f"""
 
 
 You are a figure caption extractor for research papers.
@@ -368,111 +405,28 @@ Another caption text.
 
 """
 
-
-response = client.models.generate_content(
-    model="gemini-2.5-flash",
-    contents=system_prompt_2,
-)
-
-figure_captions = response.text
-
-# print(figure_captions)
-print("\nPhase-4: All Figures Captions are extracted \n")
+    return await generate_text(system_prompt_2, model=router.route("figure_captions", system_prompt_2))
 
 
 # phase 5 /////////////////////////////////////////
 
+def correct_image_captions(figure_captions: str) -> dict:
+    # Local matcher: figure number first, then token overlap (see captions.match_captions)
+    with open(json_path, "r", encoding="utf-8") as f:
+        figure_captions_data = json.load(f)
 
-with open(json_path, "r", encoding="utf-8") as f:
-    figure_captions_data = json.load(f)
-
-
-system_prompt_3 = f"""
-You are a smart assistant helping to clean and complete image captions for a research paper presentation.
-
-### INPUTS:
-
-1. A dictionary named `image_captions`:
-   - Each key is an image filename (e.g., "image23.png").
-   - Each value is a partial, incomplete, or noisy caption string extracted from the figure.
-
-2. A list named `figure_captions`:
-   - This contains all the clean, complete, original figure captions from the research paper.
-
-### TASK:
-
-Your job is to intelligently match and update the partial captions using the full captions.
-
-### INSTRUCTIONS:
-
-- For each entry in `image_captions`, try to find a matching full caption from `figure_captions`.
-- If a confident match is found (based on figure number, meaningful phrase overlap, etc.), replace the partial caption with the exact matched full caption.
-- Do not modify or include:
-  - Entries where the original value is "No Figure caption found"
-  - Entries where a confident match is not found in `figure_captions`
-
-### OUTPUT REQUIREMENTS:
-
-- Return a dictionary in strict JSON format
-- Only include entries that were confidently matched and corrected
-- All keys (image filenames) must be unique
-- All values (captions) must be unique and directly from `figure_captions`
-- Do not generate or modify captions on your own
-- Ensure the final output is strictly parseable as JSON
-
-### DATA:
-
-Partial image captions (dictionary):
-{figure_captions_data}
-
-Full figure captions (list):
-{figure_captions}
-
-### STRICT OUTPUT FORMAT
-
-Return only the corrected dictionary as valid JSON:
-
-{{
-    "image1.png": "Figure 1: Full caption here.",
-    "image2.png": "Figure 2: Another caption."
-}}
-
-IMPORTANT:
-- Output only the corrected dictionary in valid JSON format.
-- Do not include any explanation, code block formatting, or markdown like ```json.
-- Return only raw JSON.
-"""
+    image_caption_dict = match_captions(figure_captions_data, figure_captions)
 
+    with open("image_captions.json", "w", encoding="utf-8") as f:
+        json.dump(image_caption_dict, f, indent=4, ensure_ascii=False)
 
-response = client.models.generate_content(
-    model="gemini-2.5-pro", contents=system_prompt_3
-)
-
-image_captions_text = response.text.strip()
-
-print("\nPhase-5: Preprocess the figure captions and correct it \n")
-
-
-if image_captions_text.startswith("```json"):
-    image_captions_text = re.sub(
-        r"^```json\s*|\s*```$", "", image_captions_text.strip(), flags=re.MULTILINE
-    )
-# print(image_captions_text)
-
-try:
-    image_caption_dict = json.loads(image_captions_text)
-except:
-    print("Not valid json format")
-    image_caption_dict = {}
-
-
-with open("image_captions.json", "w", encoding="utf-8") as f:
-    json.dump(image_caption_dict, f, indent=4, ensure_ascii=False)
+    return image_caption_dict
 
 
 # Phase 6 Actual generation of the ppt data/////////////////////////////////////////////////////////
 
-system_prompt_4 = f"""
+async def generate_slide_data(pre_process_text: str, image_caption_dict: dict):
+    system_prompt_4 = f"""
 
 You are a highly skilled research assistant and expert PowerPoint slide designer. Your task is to generate a structured JSON array representing a **professional, visually pleasing PowerPoint presentation** for a research paper. You will use the following two inputs
 
@@ -515,47 +469,40 @@ STRICT SLIDE STRUCTURE FORMAT
 
 """
 
+    response_text = await generate_text(system_prompt_4, model=router.route("slides", system_prompt_4))
 
-response = client.models.generate_content(
-    model="gemini-2.5-pro", contents=system_prompt_4
-)
-
-ppt_json_text = response.text.strip()
+    ppt_json_text = _strip_json_fence(response_text.strip())
 
-# print(ppt_json_text)
+    try:
+        ppt_json_dict = json.loads(ppt_json_text)
+    except:
+        print("Not valid json format")
+        ppt_json_dict = {}
 
-print("\nPhase-6: PPT data is generated\n")
-
-if ppt_json_text.startswith("```json"):
-    ppt_json_text = re.sub(
-        r"^```json\s*|\s*```$", "", ppt_json_text.strip(), flags=re.MULTILINE
-    )
+    with open("ppt_data.json", "w", encoding="utf-8") as f:
+        json.dump(ppt_json_dict, f, indent=4, ensure_ascii=False)
 
-try:
-   ppt_json_dict = json.loads(ppt_json_text)
-except:
-   print("Not valid json format")
-   ppt_json_dict = {}
+    return ppt_json_dict
 
 
-with open("ppt_data.json","w",encoding="utf-8") as f:
-    json.dump(ppt_json_dict,f ,indent=4,ensure_ascii=False)
+#Phase 7 Alignment of the ppt
 
+def describe_template_layouts(template_path: str) -> str:
+    from pptx import Presentation
 
+    pre = Presentation(template_path)
+    ppt_template_layout_info = ""
+    for i, layout in enumerate(pre.slide_layouts):
+        ppt_template_layout_info += f"Layout {i} Name: {layout.name}\n"
+        for j, placeholder in enumerate(layout.placeholders):
+            ppt_template_layout_info += f"Placeholder {j} - idx: {placeholder.placeholder_format.idx}, type: {placeholder.placeholder_format.type}\n"
+    return ppt_template_layout_info
 
 
+async def align_slides_to_template(ppt_json_dict, template_path: str):
+    ppt_template_layout_info = describe_template_layouts(template_path)
 
-#Phase 7 Alignment of the ppt 
-
-pre = Presentation(template_path)
-ppt_template_layout_info = ""
-for i, layout in enumerate(pre.slide_layouts):
-    ppt_template_layout_info += f"Layout {i} Name: {layout.name}\n"
-    for j, placeholder in enumerate(layout.placeholders):
-        ppt_template_layout_info += f"Placeholder {j} - idx: {placeholder.placeholder_format.idx}, type: {placeholder.placeholder_format.type}\n"
-
-
-system_prompt_5 = f"""
+    system_prompt_5 = f"""
 
 You're an AI assistant helping to generate a PowerPoint JSON structure. Use the provided dictionary (slide_data), and map each slide to a suitable layout from the PowerPoint template txt.
 
@@ -601,33 +548,108 @@ STRICT SLIDE STRUCTURE FORMAT
 
 """
 
-response = client.models.generate_content(
-    model = "gemini-2.5-pro",
-    contents=system_prompt_5,
-)
-
-final_ppt_text = response.text.strip()
+    response_text = await generate_text(system_prompt_5, model=router.route("layout", system_prompt_5))
 
+    final_ppt_text = _strip_json_fence(response_text.strip())
 
+    try:
+        final_ppt_dict = json.loads(final_ppt_text)
+    except:
+        print("Not valid json format")
+        final_ppt_dict = ppt_json_dict
 
-if final_ppt_text.startswith("```json"):
-    final_ppt_text= re.sub(
-        r"^```json\s*|\s*```$", "", final_ppt_text.strip(), flags=re.MULTILINE
-    )
-
-
-try:
-    final_ppt_dict = json.loads(final_ppt_text)
-except:
-    print("Not valid json format")
-    final_ppt_dict = ppt_json_dict
+    with open("final_ppt_data.json", "w", encoding="utf-8") as f:
+        json.dump(final_ppt_dict, f, indent=4, ensure_ascii=False)
 
+    return final_ppt_dict
 
 
-with open("final_ppt_data.json","w",encoding="utf-8") as f:
-    json.dump(final_ppt_dict,f,indent=4, ensure_ascii=False)
+async def build_slide_data(pdf, pre_process_text: str, template_path: str, store: CheckpointStore = None):
+    """
+    Phases 3-7: images, captions, slide JSON and layout alignment.
+    Writes final_ppt_data.json, which make_ppt_from_data renders.
+    `pdf` may be a path or an already opened fitz document. Completed phases
+    are taken from `store` when it is resuming.
+    """
+    store = store or CheckpointStore()
 
+    with profiler.phase("images"):
+        if store.has_dir("images"):
+            print("[resume] Skipping completed phase 'images'")
+            store.restore_dir("images", "images")
+        else:
+            # Rendering is CPU bound; run it off the event loop in a cpu slot
+            await run_cpu(extract_combined_images_with_captions, pdf)
+            store.save_dir("images", "images")
+    print("\nPhase-3: Retreive the Images from the Given PDF\n")
+
+    with profiler.phase("figure_captions"):
+        figure_captions = await store.run("figure_captions", extract_figure_captions, pre_process_text)
+    print("\nPhase-4: All Figures Captions are extracted \n")
+
+    with profiler.phase("caption_dict"):
+        image_caption_dict = await store.run("caption_dict", correct_image_captions, figure_captions)
+    print("\nPhase-5: Preprocess the figure captions and correct it \n")
+
+    with profiler.phase("slide_data"):
+        ppt_json_dict = await store.run("slide_data", generate_slide_data, pre_process_text, image_caption_dict,
+                                        valid=_is_slide_list)
+    print("\nPhase-6: PPT data is generated\n")
+
+    with profiler.phase("final_slide_data"):
+        final_ppt_dict = await store.run("final_slide_data", align_slides_to_template, ppt_json_dict, template_path,
+                                         valid=_is_slide_list)
+    if not _is_slide_list(final_ppt_dict):
+        # Fail here, with earlier valid phases checkpointed, rather than with a KeyError while rendering
+        raise ValueError("Slide data from the model is empty or not valid JSON; rerun to retry phases 6-7")
+    # A resumed run skips align_slides_to_template, which normally writes this file
+    with open("final_ppt_data.json", "w", encoding="utf-8") as f:
+        json.dump(final_ppt_dict, f, indent=4, ensure_ascii=False)
+    print("\nPhase-7: Final Presenation Json generated\n")
+    return final_ppt_dict
+
+
+async def run_pipeline(pdf_path: str, output_pptx_path: str, template_number: str, length_of_ppt: str,
+                       store: CheckpointStore = None) -> None:
+    template_path = get_template_path(template_number)
+    store = store or CheckpointStore()
+    router.plan(PPT_PHASES)
+
+    async def extract_and_preprocess():
+        text = await run_cpu(extract_text, pdf_path)
+        print("\nPhase-1: Text Extraction is completed\n")
+        return await preprocess_text(text, length_of_ppt)
+
+    with profiler.phase("preprocessed_text"):
+        pre_process_text = await store.run("preprocessed_text", extract_and_preprocess)
+    print("\nPhase-2: Text Processing Completed \n")
+
+    await build_slide_data(pdf_path, pre_process_text, template_path, store)
+
+    with profiler.phase("render_pptx"):
+        await run_cpu(make_ppt_from_data, template_path, output_pptx_path)
+    store.clear()
+
+
+def main():
+    # -----------------------
+    #  Argument handling from server.js
+    # -----------------------
+    resume = pop_resume_flag(sys.argv)
+    if len(sys.argv) < 5:
+        print("Usage: python ppt_gen.py <pdf_path> <output_pptx_path> <template_number> <length> [--resume]")
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]          # e.g. backend/uploads/1723648292381.pdf
+    output_pptx_path = sys.argv[2]  # e.g. backend/outputs/presentation_1723648292381.pptx
+    template_number = sys.argv[3]   # e.g. "1"
+    length_of_ppt = sys.argv[4]     # e.g. "short" | "medium" | "long"
+
+    store = CheckpointStore.for_job(
+        pdf_path, {"job": "presentation", "template": template_number, "length": length_of_ppt}, resume=resume
+    )
+    asyncio.run(run_pipeline(pdf_path, output_pptx_path, template_number, length_of_ppt, store))
 
-print("\nPhase-7: Final Presenation Json generated\n")
 
-make_ppt_from_data(template_path)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
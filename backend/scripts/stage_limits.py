@@ -0,0 +1,62 @@
+import os
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+
+import env  # noqa: F401  (loads backend/.env)
+
+# ---------- Host-wide stage slots ----------
+# Several pipeline processes run side by side (see backend/jobScheduler.js).
+# CPU-bound stages (PDF extraction, figure rendering, PPTX rendering, audio
+# merge/encode) and network-bound stages (Gemini calls, TTS) draw from separate
+# slot pools shared by every process on the host, so CPU work is capped near
+# the core count while many more jobs can wait on the network at once.
+# A slot is an flock on a file in STAGE_LOCK_DIR; the OS releases it if the
+# process dies. A limit of 0 disables that pool.
+STAGE_LOCK_DIR = os.getenv("STAGE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "paper-stage-slots"))
+STAGE_SLOTS = {
+    "cpu": int(os.getenv("CPU_STAGE_SLOTS") or os.cpu_count() or 2),
+    "net": int(os.getenv("NET_STAGE_SLOTS") or 8),
+}
+STAGE_POLL_S = 0.1
+
+
+def _try_acquire(kind: str):
+    import fcntl
+    os.makedirs(STAGE_LOCK_DIR, exist_ok=True)
+    for i in range(STAGE_SLOTS[kind]):
+        fd = os.open(os.path.join(STAGE_LOCK_DIR, f"{kind}-{i}.lock"), os.O_CREAT | os.O_RDWR, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _release(fd) -> None:
+    import fcntl
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+@asynccontextmanager
+async def astage_slot(kind: str):
+    """Hold one `kind` slot ("cpu" or "net") for the block; waits with asyncio.sleep so the loop stays free."""
+    if STAGE_SLOTS[kind] <= 0:
+        yield
+        return
+    fd = _try_acquire(kind)
+    while fd is None:
+        await asyncio.sleep(STAGE_POLL_S)
+        fd = _try_acquire(kind)
+    try:
+        yield
+    finally:
+        _release(fd)
+
+
+async def run_cpu(fn, *args):
+    """Run a blocking CPU-bound call in a worker thread while holding a cpu slot."""
+    async with astage_slot("cpu"):
+        return await asyncio.to_thread(fn, *args)
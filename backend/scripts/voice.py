@@ -1,12 +1,16 @@
-import asyncio
 import os
 import wave
+import shutil
 import tempfile
-from typing import List
+import subprocess
+from typing import Iterable, List
 
-import edge_tts
-from google import genai
-from google.genai import types
+import env  # noqa: F401  (loads backend/.env)
+from memory_guard import fits_budget
+from stage_limits import astage_slot, run_cpu
+
+# edge_tts and google-genai are imported inside the paths that use them:
+# the low quality path never loads genai, the high quality path never loads edge_tts.
 
 # ---------- Voice mapping (Gemini label -> Edge TTS voice id) ----------
 EDGE_TTS_VOICE_MAP = {
@@ -56,28 +60,60 @@ async def tts_edge_single_speaker(text: str, voice_label: str, output_file: str)
     mapped = EDGE_TTS_VOICE_MAP.get(base)
     if not mapped:
         raise ValueError(f"Invalid voice '{voice_label}' (base '{base}' not found in EDGE_TTS_VOICE_MAP)")
+    import edge_tts
     communicate = edge_tts.Communicate(text, mapped)
-    await communicate.save(output_file)
+    async with astage_slot("net"):
+        await communicate.save(output_file)
+
+# Decoded PCM held by pydub is roughly this many times the MP3 segment size
+MP3_DECODE_RATIO = 12
 
 def merge_mp3_files(input_files: List[str], output_file: str) -> None:
     """
-    Merge MP3 segments. Uses pydub if available; falls back to naive concat.
+    Merge MP3 segments. Uses pydub if available and the decoded audio fits
+    JOB_MEMORY_BUDGET_MB; otherwise streams the segments (see _concat_mp3_streaming).
     """
-    try:
-        from pydub import AudioSegment
-        if not input_files:
-            raise ValueError("No input files to merge.")
-        combined = AudioSegment.from_file(input_files[0], format="mp3")
-        for f in input_files[1:]:
-            seg = AudioSegment.from_file(f, format="mp3")
-            combined += seg
-        combined.export(output_file, format="mp3")
-    except Exception:
-        # Fallback: byte concat (simple, not gapless but works without deps)
-        with open(output_file, "wb") as w:
+    decoded_bytes = sum(os.path.getsize(f) for f in input_files) * MP3_DECODE_RATIO
+    if fits_budget(decoded_bytes):
+        try:
+            from pydub import AudioSegment
+            if not input_files:
+                raise ValueError("No input files to merge.")
+            combined = AudioSegment.from_file(input_files[0], format="mp3")
+            for f in input_files[1:]:
+                seg = AudioSegment.from_file(f, format="mp3")
+                combined += seg
+            combined.export(output_file, format="mp3")
+            return
+        except Exception:
+            pass
+    else:
+        print(f"[memory] ~{decoded_bytes // (1024 * 1024)} MB decoded audio exceeds the budget; streaming merge")
+    _concat_mp3_streaming(input_files, output_file)
+
+def _concat_mp3_streaming(input_files: List[str], output_file: str) -> None:
+    """Concatenate without decoding: ffmpeg's concat demuxer, else plain byte concat."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg and input_files:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as lst:
             for f in input_files:
-                with open(f, "rb") as r:
-                    w.write(r.read())
+                path = os.path.abspath(f).replace("'", "'\\''")
+                lst.write(f"file '{path}'\n")
+        try:
+            proc = subprocess.run(
+                [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                 "-f", "concat", "-safe", "0", "-i", lst.name, "-c", "copy", output_file],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            if proc.returncode == 0:
+                return
+        finally:
+            os.remove(lst.name)
+    # Fallback: byte concat (simple, not gapless but works without deps)
+    with open(output_file, "wb") as w:
+        for f in input_files:
+            with open(f, "rb") as r:
+                shutil.copyfileobj(r, w)
 
 # ---------- Gemini Multi-speaker TTS (High Quality) ----------
 def _wave_write_bytes(filepath: str, pcm_bytes: bytes, channels=1, rate=24000, sample_width=2) -> None:
@@ -87,45 +123,124 @@ def _wave_write_bytes(filepath: str, pcm_bytes: bytes, channels=1, rate=24000, s
         wf.setframerate(rate)
         wf.writeframes(pcm_bytes)
 
+# ---------- Compressed encoding (High Quality) ----------
+# Output container/codec follows the file extension; speech at 48 kbit/s is
+# roughly a tenth of the size of 24 kHz 16-bit PCM.
+PODCAST_AUDIO_BITRATE = os.getenv("PODCAST_AUDIO_BITRATE", "48k")
+_ENCODER_ARGS = {
+    ".mp3": ["-c:a", "libmp3lame", "-f", "mp3"],
+    ".ogg": ["-c:a", "libopus", "-f", "ogg"],
+    ".opus": ["-c:a", "libopus", "-f", "ogg"],
+}
+PCM_CHUNK_BYTES = 64 * 1024
+
+def _iter_pcm_chunks(pcm_bytes: bytes) -> Iterable[bytes]:
+    view = memoryview(pcm_bytes)
+    for i in range(0, len(view), PCM_CHUNK_BYTES):
+        yield view[i:i + PCM_CHUNK_BYTES]
+
+def encode_pcm(pcm_chunks: Iterable[bytes], output_path: str, channels=1, rate=24000,
+               bitrate: str = None) -> None:
+    """
+    Stream 16-bit little-endian PCM through ffmpeg into output_path.
+    .mp3 -> MP3, .ogg/.opus -> Opus, .wav -> uncompressed WAV.
+    Compressed formats need ffmpeg; without it only .wav can be written.
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext == ".wav":
+        _wave_write_bytes(output_path, b"".join(pcm_chunks), channels=channels, rate=rate)
+        return
+    if ext not in _ENCODER_ARGS:
+        raise ValueError(f"Unsupported audio extension '{ext}' (expected .mp3, .ogg, .opus or .wav)")
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError(f"ffmpeg is required to write {ext} audio ({output_path}); install it or use a .wav output")
+
+    cmd = [
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0",
+        *_ENCODER_ARGS[ext][:2], "-b:a", bitrate or PODCAST_AUDIO_BITRATE,
+        *_ENCODER_ARGS[ext][2:], output_path,
+    ]
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=err)
+        try:
+            for chunk in pcm_chunks:
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; reported via returncode below
+        finally:
+            proc.stdin.close()
+            proc.wait()
+        if proc.returncode != 0:
+            err.seek(0)
+            raise RuntimeError(f"ffmpeg encoding failed: {err.read().decode(errors='replace').strip()}")
+
 async def tts_gemini_multi_speaker(conversation_text: str,
                                    Alex_voice_label: str,
                                    Avery_voice_label: str,
-                                   output_wav_path: str) -> None:
+                                   output_path: str,
+                                   pcm_cache_path: str = None) -> None:
     """
-    One-shot high-quality WAV using Gemini multi-speaker TTS.
+    One-shot high-quality audio using Gemini multi-speaker TTS.
     conversation_text should look like:
         'Alex: ...\\nAvery: ...\\nAlex: ...'
+    The 24 kHz PCM is encoded according to output_path's extension (see encode_pcm).
+    If pcm_cache_path exists it is used instead of calling the API; otherwise the
+    synthesized PCM is written there before encoding.
     """
+    if pcm_cache_path and os.path.exists(pcm_cache_path):
+        with open(pcm_cache_path, "rb") as f:
+            audio_bytes = f.read()
+    else:
+        audio_bytes = await _synthesize_multi_speaker(conversation_text, Alex_voice_label, Avery_voice_label)
+        if pcm_cache_path:
+            with open(pcm_cache_path + ".part", "wb") as f:
+                f.write(audio_bytes)
+            os.replace(pcm_cache_path + ".part", pcm_cache_path)
+
+    # ffmpeg encoding is blocking; keep the event loop free for other jobs' network waits
+    await run_cpu(encode_pcm, _iter_pcm_chunks(audio_bytes), output_path)
+
+async def _synthesize_multi_speaker(conversation_text: str,
+                                    Alex_voice_label: str,
+                                    Avery_voice_label: str) -> bytes:
+    from google.genai import types
+    from gemini_client import get_client, with_quota_backoff
+
     Alex_base = normalize_voice_name(Alex_voice_label)
     Avery_base = normalize_voice_name(Avery_voice_label)
 
-    client = genai.Client()  # expects GOOGLE_API_KEY in env (or is configured elsewhere)
-
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash-preview-tts",
-        contents=conversation_text,
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
-                    speaker_voice_configs=[
-                        types.SpeakerVoiceConfig(
-                            speaker="Alex",
-                            voice_config=types.VoiceConfig(
-                                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=Alex_base)
-                            ),
-                        ),
-                        types.SpeakerVoiceConfig(
-                            speaker="Avery",
-                            voice_config=types.VoiceConfig(
-                                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=Avery_base)
-                            ),
-                        ),
-                    ]
-                )
+    client = get_client()
+
+    async def attempt():
+        async with astage_slot("net"):
+            return await client.aio.models.generate_content(
+                model="gemini-2.5-flash-preview-tts",
+                contents=conversation_text,
+                config=types.GenerateContentConfig(
+                    response_modalities=["AUDIO"],
+                    speech_config=types.SpeechConfig(
+                        multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                            speaker_voice_configs=[
+                                types.SpeakerVoiceConfig(
+                                    speaker="Alex",
+                                    voice_config=types.VoiceConfig(
+                                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=Alex_base)
+                                    ),
+                                ),
+                                types.SpeakerVoiceConfig(
+                                    speaker="Avery",
+                                    voice_config=types.VoiceConfig(
+                                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=Avery_base)
+                                    ),
+                                ),
+                            ]
+                        )
+                    )
+                ),
             )
-        ),
-    )
 
-    audio_bytes = resp.candidates[0].content.parts[0].inline_data.data
-    _wave_write_bytes(output_wav_path, audio_bytes)
\ No newline at end of file
+    # Quota errors back off and retry instead of failing the whole high quality job
+    resp = await with_quota_backoff(attempt)
+    return resp.candidates[0].content.parts[0].inline_data.data
@@ -6,6 +6,8 @@ const { exec } = require("child_process")
 const cors = require("cors")
 const fs = require("fs")
 const { createClient } = require("@supabase/supabase-js")
+const { JobScheduler } = require("./jobScheduler")
+const { ResultIndex, fileSha256, normalizeSettings } = require("./resultIndex")
 const app = express()
 const corsOptions = {
   origin: [
@@ -76,6 +78,15 @@ const supabase = createClient(supabaseUrl, supabaseServiceKey)
 const uploadDir = path.join(__dirname, "uploads")
 const scriptsDir = path.join(__dirname, "scripts")
 const outputDir = path.join(__dirname, "outputs")
+// Each pipeline run gets its own working directory: ppt_gen.py writes images/ and its
+// JSON intermediates relative to the cwd, so concurrent jobs must not share one
+const jobsDir = path.join(__dirname, "jobs")
+// Checkpoints outlive the per-job directory, so relative paths are pinned to the server's cwd
+const pipelineEnv = {
+  ...process.env,
+  CHECKPOINT_DIR: path.resolve(process.env.CHECKPOINT_DIR || "checkpoints"),
+  ...(process.env.PIPELINE_METRICS_FILE && { PIPELINE_METRICS_FILE: path.resolve(process.env.PIPELINE_METRICS_FILE) }),
+}
 
 if (!fs.existsSync(uploadDir)) fs.mkdirSync(uploadDir, { recursive: true })
 if (!fs.existsSync(scriptsDir)) fs.mkdirSync(scriptsDir, { recursive: true })
@@ -83,6 +94,20 @@ if (!fs.existsSync(outputDir)) fs.mkdirSync(outputDir, { recursive: true })
 
 app.use("/outputs", express.static(outputDir))
 
+// Job scheduling: a fixed number of pipelines run at once, queued jobs are taken
+// round-robin per user, and uploads are refused early when the queue is full.
+// CPU/network stage limits inside the pipelines are shared across processes
+// (CPU_STAGE_SLOTS / NET_STAGE_SLOTS, see scripts/stage_limits.py).
+const scheduler = new JobScheduler({
+  maxConcurrent: Number.parseInt(process.env.MAX_CONCURRENT_JOBS || "2", 10),
+  maxQueued: Number.parseInt(process.env.MAX_QUEUED_JOBS || "20", 10),
+  maxQueuedPerUser: Number.parseInt(process.env.MAX_QUEUED_JOBS_PER_USER || "5", 10),
+})
+const QUEUE_RETRY_AFTER_S = Number.parseInt(process.env.QUEUE_RETRY_AFTER_S || "30", 10)
+
+// Output-level dedup: previously generated outputs keyed by PDF hash and settings
+const resultIndex = new ResultIndex(process.env.RESULT_INDEX_PATH || path.join(__dirname, "results", "index.json"))
+
 // Multer configuration
 const storage = multer.diskStorage({
   destination: (req, file, cb) => {
@@ -111,10 +136,18 @@ function getContentType(fileName) {
     ".pdf": "application/pdf",
     ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
     ".mp3": "audio/mpeg",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/wav",
   }
   return contentTypes[ext] || "application/octet-stream"
 }
 
+// High quality podcasts are encoded from Gemini PCM; PODCAST_HQ_FORMAT picks mp3 (default) or ogg (Opus)
+function podcastExtension(quality) {
+  if ((quality || "low").toLowerCase() !== "high") return "mp3"
+  return (process.env.PODCAST_HQ_FORMAT || "mp3").toLowerCase() === "ogg" ? "ogg" : "mp3"
+}
+
 async function uploadToSupabaseStorage(filePath, fileName, bucket = "processed-files") {
   try {
     const fileBuffer = fs.readFileSync(filePath)
@@ -177,6 +210,74 @@ async function updateGenerationStatus(generationId, status, additionalData = {})
   }
 }
 
+// Type-specific metadata shown with a completed generation
+function outputMetadata(outputType, settings) {
+  if (outputType === "podcast") {
+    return {
+      duration: settings.length === "short" ? "5-10 min" : settings.length === "medium" ? "15-25 min" : "30-45 min",
+    }
+  }
+  if (outputType === "presentation") {
+    return { slides: settings.length === "short" ? 8 : settings.length === "medium" ? 15 : 25 }
+  }
+  return {}
+}
+
+// Copy a stored object to a new path in the same bucket and return its public URL
+async function copyInSupabaseStorage(fromPath, toPath, bucket) {
+  const { error } = await supabase.storage.from(bucket).copy(fromPath, toPath)
+  if (error) throw error
+  const {
+    data: { publicUrl },
+  } = supabase.storage.from(bucket).getPublicUrl(toPath)
+  return publicUrl
+}
+
+// Complete a request from indexed results: every user gets their own copies, so deleting
+// one generation never breaks another. Returns the new generation ids, or null when a
+// stored object is gone (its index entries are dropped and the caller runs the pipeline).
+async function reuseResults(userId, originalName, settings, outputTypes, resultKeys) {
+  const entries = outputTypes.map((outType) => resultIndex.get(resultKeys[outType]))
+  const timestamp = Date.now()
+  const copied = []
+  let originalFileUrl
+  try {
+    originalFileUrl = await copyInSupabaseStorage(
+      entries[0].originalPath,
+      `${userId}/${timestamp}_${originalName}`,
+      "uploads",
+    )
+    for (const [i, outType] of outputTypes.entries()) {
+      const outputFileName = `${userId}/${outType}_${timestamp}${path.extname(entries[i].storagePath)}`
+      const downloadUrl = await copyInSupabaseStorage(entries[i].storagePath, outputFileName, "processed-files")
+      copied.push({ outType, downloadUrl, entry: entries[i] })
+    }
+  } catch (error) {
+    console.warn("Indexed result is no longer available, regenerating:", error.message || error)
+    outputTypes.forEach((outType) => resultIndex.remove(resultKeys[outType]))
+    return null
+  }
+
+  const ids = []
+  for (const { outType, downloadUrl, entry } of copied) {
+    const record = await saveGenerationRecord(userId, {
+      type: outType,
+      title: originalName.replace(".pdf", ""),
+      original_file_name: originalName,
+      original_file_url: originalFileUrl,
+      status: "completed",
+      settings,
+      download_url: downloadUrl,
+      file_size: entry.fileSize,
+      script_output: `Reused output of generation ${entry.generationId}`,
+      ...outputMetadata(outType, settings),
+    })
+    ids.push(record.id)
+  }
+  console.log("Reused indexed results for user:", userId, "generations:", ids)
+  return ids
+}
+
 function isActualError(stderr) {
   if (!stderr) return false
 
@@ -198,8 +299,10 @@ function isActualError(stderr) {
 }
 
 // Main upload and processing endpoint
+// outputType "both" runs one shared pipeline that yields a presentation and a podcast
 app.post("/api/upload", upload.single("file"), async (req, res) => {
-  let generationId = null
+  const generationIds = []
+  let reservation = null
 
   try {
     if (!req.file) {
@@ -230,74 +333,140 @@ app.post("/api/upload", upload.single("file"), async (req, res) => {
       parsedSettings = {}
     }
 
-    // Upload original PDF to Supabase Storage
-    const originalFileName = `${userId}/${Date.now()}_${req.file.originalname}`
-    const originalFileUrl = await uploadToSupabaseStorage(uploadedFilePath, originalFileName, "uploads")
-
-    // Create initial generation record
-    const initialData = {
-      type: outputType.toLowerCase(),
-      title: req.file.originalname.replace(".pdf", ""),
-      original_file_name: req.file.originalname,
-      original_file_url: originalFileUrl,
-      status: "processing",
-      settings: parsedSettings,
-    }
-
-    console.log("Creating generation record:", initialData)
-    const generationRecord = await saveGenerationRecord(userId, initialData)
-    generationId = generationRecord.id
+    const type = outputType.toLowerCase()
 
-    // Script mapping - only presentation and podcast
+    // Script mapping - presentation, podcast, or both from one shared pipeline run
     const scriptMap = {
       presentation: "ppt_gen.py",
       podcast: "generate_podcast.py",
+      both: "generate_both.py",
     }
 
-    const scriptName = scriptMap[outputType.toLowerCase()]
+    const scriptName = scriptMap[type]
     if (!scriptName) {
-      await updateGenerationStatus(generationId, "failed", { error: "Invalid output type" })
-      return res.status(400).json({ error: "Invalid output type. Only 'presentation' and 'podcast' are supported." })
+      return res
+        .status(400)
+        .json({ error: "Invalid output type. Only 'presentation', 'podcast' and 'both' are supported." })
     }
 
-    const pathToPythonScript = path.join(scriptsDir, scriptName)
-    if (!fs.existsSync(pathToPythonScript)) {
-      await updateGenerationStatus(generationId, "failed", { error: `Script ${scriptName} not found` })
-      return res.status(500).json({ error: `Script ${scriptName} not found.` })
+    // A combined job produces one generation record per output type
+    const outputTypes = type === "both" ? ["presentation", "podcast"] : [type]
+
+    // Same PDF and settings as an earlier job: reuse its outputs unless regeneration is forced
+    const pdfHash = await fileSha256(uploadedFilePath)
+    const resultKeys = {}
+    for (const outType of outputTypes) {
+      resultKeys[outType] = resultIndex.key(pdfHash, outType, normalizeSettings(outType, parsedSettings, podcastExtension, type))
     }
+    const forceRegenerate = String(req.body.forceRegenerate ?? parsedSettings.forceRegenerate ?? "") === "true"
+    if (!forceRegenerate && outputTypes.every((outType) => resultIndex.get(resultKeys[outType]))) {
+      const reusedIds = await reuseResults(userId, req.file.originalname, parsedSettings, outputTypes, resultKeys)
+      if (reusedIds) {
+        try {
+          fs.unlinkSync(uploadedFilePath)
+        } catch (cleanupError) {
+          console.warn("Could not clean up local files:", cleanupError)
+        }
+        return res.json({
+          message: `${outputType} generation reused from an identical earlier upload`,
+          generationId: reusedIds[0],
+          generationIds: reusedIds,
+          status: "completed",
+          reused: true,
+        })
+      }
+    }
+
+    // Backpressure: refuse before uploading anything or creating records
+    const admission = scheduler.canAccept(userId)
+    if (!admission.ok) {
+      try {
+        fs.unlinkSync(uploadedFilePath)
+      } catch (cleanupError) {
+        console.warn("Could not clean up rejected upload:", cleanupError)
+      }
+      res.set("Retry-After", String(QUEUE_RETRY_AFTER_S))
+      return res.status(503).json({ error: admission.reason, ...scheduler.stats() })
+    }
+    reservation = admission.reservation
+
+    // Upload original PDF to Supabase Storage
+    const originalFileName = `${userId}/${Date.now()}_${req.file.originalname}`
+    const originalFileUrl = await uploadToSupabaseStorage(uploadedFilePath, originalFileName, "uploads")
 
-    // Generate output file name
+    // Generate output file names
     const timestamp = Date.now()
-    const outputFileName =
-      outputType.toLowerCase() === "presentation"
-        ? `${userId}/presentation_${timestamp}.pptx`
-        : `${userId}/podcast_${timestamp}.mp3`
+    const outputs = []
+    for (const outType of outputTypes) {
+      // Create initial generation record
+      const initialData = {
+        type: outType,
+        title: req.file.originalname.replace(".pdf", ""),
+        original_file_name: req.file.originalname,
+        original_file_url: originalFileUrl,
+        status: "processing",
+        settings: parsedSettings,
+      }
+
+      console.log("Creating generation record:", initialData)
+      const generationRecord = await saveGenerationRecord(userId, initialData)
+      generationIds.push(generationRecord.id)
 
-    const localOutputPath = path.join(outputDir, path.basename(outputFileName))
+      const outputFileName =
+        outType === "presentation"
+          ? `${userId}/presentation_${timestamp}.pptx`
+          : `${userId}/podcast_${timestamp}.${podcastExtension(parsedSettings.quality)}`
+
+      outputs.push({
+        type: outType,
+        generationId: generationRecord.id,
+        outputFileName,
+        localOutputPath: path.join(outputDir, path.basename(outputFileName)),
+      })
+    }
 
-    console.log(`Executing ${scriptName} for ${outputType}...`)
+    const failAll = async (fields) => {
+      for (const id of generationIds) {
+        await updateGenerationStatus(id, "failed", fields)
+      }
+    }
 
+    const pathToPythonScript = path.join(scriptsDir, scriptName)
+    if (!fs.existsSync(pathToPythonScript)) {
+      scheduler.release(reservation)
+      await failAll({ error: `Script ${scriptName} not found` })
+      return res.status(500).json({ error: `Script ${scriptName} not found.` })
+    }
+
+    const templateNumber = parsedSettings.template || "1"
+    const length = parsedSettings.length || "medium"
+    const AlexVoice = parsedSettings.AlexVoice || "Kore"
+    const AveryVoice = parsedSettings.AveryVoice || "Puck"
+    const quality = parsedSettings.quality || "low"
+    const localPathOf = (outType) => outputs.find((o) => o.type === outType).localOutputPath
+
+    // --resume: a re-upload of the same PDF and settings after a failure continues from the
+    // last completed phase (checkpoints are keyed by content hash and cleared on success).
+    // forceRegenerate starts from scratch.
+    const resumeFlag = forceRegenerate ? "" : " --resume"
     let command = ""
 
-    if (outputType.toLowerCase() === "presentation") {
-      const templateNumber = parsedSettings.template || "1"
-      const length = parsedSettings.length || "medium"
-      command = `python "${pathToPythonScript}" "${uploadedFilePath}" "${localOutputPath}" "${templateNumber}" "${length}"`
-    } else if (outputType.toLowerCase() === "podcast") {
-      const AlexVoice = parsedSettings.AlexVoice || "Kore"
-      const AveryVoice = parsedSettings.AveryVoice || "Puck"
-      const quality = parsedSettings.quality || "low"
-      command = `python "${pathToPythonScript}" "${uploadedFilePath}" "${localOutputPath}" "${AlexVoice}" "${AveryVoice}" "${quality}"`
+    if (type === "presentation") {
+      command = `python "${pathToPythonScript}" "${uploadedFilePath}" "${localPathOf("presentation")}" "${templateNumber}" "${length}"${resumeFlag}`
+    } else if (type === "podcast") {
+      command = `python "${pathToPythonScript}" "${uploadedFilePath}" "${localPathOf("podcast")}" "${AlexVoice}" "${AveryVoice}" "${quality}"${resumeFlag}`
+    } else if (type === "both") {
+      command = `python "${pathToPythonScript}" "${uploadedFilePath}" "${localPathOf("presentation")}" "${localPathOf("podcast")}" "${templateNumber}" "${length}" "${AlexVoice}" "${AveryVoice}" "${quality}"${resumeFlag}`
     }
 
-    // Execute Python script
-    exec(command, async (error, stdout, stderr) => {
+    // Runs once the scheduler gives this job a worker slot
+    const onScriptExit = async (error, stdout, stderr) => {
       try {
         const hasActualError = error || isActualError(stderr)
 
         if (hasActualError) {
           console.error("Script error:", error || stderr)
-          await updateGenerationStatus(generationId, "failed", {
+          await failAll({
             error: "Error running Python script",
             script_output: stderr || error?.message,
           })
@@ -310,78 +479,108 @@ app.post("/api/upload", upload.single("file"), async (req, res) => {
 
         console.log(`Script output:\n${stdout}`)
 
-        // Check if the output file was created
-        if (!fs.existsSync(localOutputPath)) {
-          console.error("Output file was not created:", localOutputPath)
-          await updateGenerationStatus(generationId, "failed", {
-            error: "Output file was not generated",
-            script_output: stdout + "\n" + stderr,
+        for (const output of outputs) {
+          const { generationId, localOutputPath, outputFileName } = output
+
+          // Check if the output file was created
+          if (!fs.existsSync(localOutputPath)) {
+            console.error("Output file was not created:", localOutputPath)
+            await updateGenerationStatus(generationId, "failed", {
+              error: "Output file was not generated",
+              script_output: stdout + "\n" + stderr,
+            })
+            continue
+          }
+
+          console.log("Output file created successfully:", localOutputPath)
+
+          // Upload processed file to Supabase Storage
+          console.log("Uploading to Supabase Storage...")
+          const processedFileUrl = await uploadToSupabaseStorage(localOutputPath, outputFileName, "processed-files")
+          console.log("File uploaded to Supabase:", processedFileUrl)
+
+          // Get file stats
+          const stats = fs.statSync(localOutputPath)
+          const fileSizeBytes = stats.size
+
+          // Update generation record with success
+          const updateData = {
+            download_url: processedFileUrl,
+            file_size: fileSizeBytes,
+            script_output: stdout,
+            ...outputMetadata(output.type, parsedSettings),
+          }
+
+          console.log("Updating generation status to completed...")
+          await updateGenerationStatus(generationId, "completed", updateData)
+          console.log("Generation completed successfully!")
+
+          resultIndex.put(resultKeys[output.type], {
+            storagePath: outputFileName,
+            originalPath: originalFileName,
+            fileSize: fileSizeBytes,
+            generationId,
           })
-          return
-        }
-
-        console.log("Output file created successfully:", localOutputPath)
-
-        // Upload processed file to Supabase Storage
-        console.log("Uploading to Supabase Storage...")
-        const processedFileUrl = await uploadToSupabaseStorage(localOutputPath, outputFileName, "processed-files")
-        console.log("File uploaded to Supabase:", processedFileUrl)
-
-        // Get file stats
-        const stats = fs.statSync(localOutputPath)
-        const fileSizeBytes = stats.size
-
-        // Update generation record with success
-        const updateData = {
-          download_url: processedFileUrl,
-          file_size: fileSizeBytes,
-          script_output: stdout,
-        }
 
-        // Add type-specific metadata
-        if (outputType.toLowerCase() === "podcast") {
-          updateData.duration =
-            parsedSettings.length === "short"
-              ? "5-10 min"
-              : parsedSettings.length === "medium"
-                ? "15-25 min"
-                : "30-45 min"
-        } else if (outputType.toLowerCase() === "presentation") {
-          updateData.slides = parsedSettings.length === "short" ? 8 : parsedSettings.length === "medium" ? 15 : 25
+          try {
+            fs.unlinkSync(localOutputPath)
+          } catch (cleanupError) {
+            console.warn("Could not clean up local output:", cleanupError)
+          }
         }
 
-        console.log("Updating generation status to completed...")
-        await updateGenerationStatus(generationId, "completed", updateData)
-        console.log("Generation completed successfully!")
-
         // Clean up local files
         try {
           fs.unlinkSync(uploadedFilePath)
-          fs.unlinkSync(localOutputPath)
           console.log("Local files cleaned up")
         } catch (cleanupError) {
           console.warn("Could not clean up local files:", cleanupError)
         }
       } catch (processError) {
         console.error("Error in post-processing:", processError)
-        await updateGenerationStatus(generationId, "failed", {
+        await failAll({
           error: "Error in post-processing",
           details: processError.message,
         })
       }
-    })
+    }
+
+    // Execute Python script when a worker slot is free
+    const queuePosition = scheduler.enqueue(
+      userId,
+      generationIds,
+      () =>
+        new Promise((resolve) => {
+          console.log(`Executing ${scriptName} for ${outputType}...`)
+          const jobDir = path.join(jobsDir, String(generationIds[0]))
+          const removeJobDir = () => fs.rm(jobDir, { recursive: true, force: true }, () => resolve())
+          try {
+            fs.mkdirSync(jobDir, { recursive: true })
+          } catch (mkdirError) {
+            onScriptExit(mkdirError, "", "").finally(removeJobDir)
+            return
+          }
+          exec(command, { cwd: jobDir, env: pipelineEnv }, (error, stdout, stderr) =>
+            onScriptExit(error, stdout, stderr).finally(removeJobDir),
+          )
+        }),
+      reservation,
+    )
 
     // Return immediate response with generation ID
     res.json({
-      message: `${outputType} generation started`,
-      generationId: generationId,
+      message: queuePosition > 0 ? `${outputType} generation queued` : `${outputType} generation started`,
+      generationId: generationIds[0],
+      generationIds,
       status: "processing",
+      queuePosition,
     })
   } catch (error) {
     console.error("Error in upload endpoint:", error)
+    scheduler.release(reservation)
 
-    if (generationId) {
-      await updateGenerationStatus(generationId, "failed", {
+    for (const id of generationIds) {
+      await updateGenerationStatus(id, "failed", {
         error: "Server error",
         details: error.message,
       })
@@ -404,13 +603,23 @@ app.get("/api/generation/:id", async (req, res) => {
       return res.status(404).json({ error: "Generation not found" })
     }
 
-    res.json(data)
+    // 0 = running, n = waiting behind n - 1 jobs, null = not scheduled here
+    res.json({ ...data, queue_position: scheduler.position(id) })
   } catch (error) {
     console.error("Error fetching generation:", error)
     res.status(500).json({ error: "Internal server error" })
   }
 })
 
+// Queue position of a generation that is waiting or running
+app.get("/api/queue/:id", (req, res) => {
+  const position = scheduler.position(req.params.id)
+  if (position === null) {
+    return res.status(404).json({ error: "Generation is not queued or running" })
+  }
+  res.json({ generationId: req.params.id, position, status: position === 0 ? "running" : "queued", ...scheduler.stats() })
+})
+
 // Get user generations endpoint
 app.get("/api/user/:userId/generations", async (req, res) => {
   try {
@@ -450,10 +659,24 @@ app.delete("/api/generation/:id", async (req, res) => {
 
     // Delete files from storage
     try {
+      // A "both" job (or a reused result) gives several generations one original PDF;
+      // it is removed with the last generation that references it
+      let originalShared = false
       if (generation.original_file_url) {
+        const { count, error: countError } = await supabase
+          .from("generations")
+          .select("id", { count: "exact", head: true })
+          .eq("original_file_url", generation.original_file_url)
+          .neq("id", id)
+        // When unsure, keep the original rather than break another generation
+        originalShared = !!countError || count > 0
+      }
+
+      if (generation.original_file_url && !originalShared) {
         const originalPath = generation.original_file_url.split("public/uploads/")[1]
         if (originalPath) {
           await supabase.storage.from("uploads").remove([originalPath])
+          resultIndex.removeByPath(decodeURIComponent(originalPath))
         }
       }
 
@@ -461,6 +684,7 @@ app.delete("/api/generation/:id", async (req, res) => {
         const processedPath = generation.download_url.split("public/processed-files/")[1]
         if (processedPath) {
           await supabase.storage.from("processed-files").remove([processedPath])
+          resultIndex.removeByPath(decodeURIComponent(processedPath))
         }
       }
     } catch (storageError) {
@@ -484,6 +708,7 @@ app.get("/api/health", (req, res) => {
     status: "ok",
     timestamp: new Date().toISOString(),
     supabase: !!supabaseUrl,
+    jobs: scheduler.stats(),
   })
 })
 
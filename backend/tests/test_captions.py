@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from captions import NO_CAPTION, figure_label, match_captions, parse_figure_captions  # noqa: E402
+
+
+def test_parses_plain_and_multiline_captions():
+    text = "Figure 1\nOverview of the\nsystem.\n\nFig. 2: Results on the benchmark."
+    assert parse_figure_captions(text) == [
+        ("1", "Figure 1: Overview of the system."),
+        ("2", "Figure 2: Results on the benchmark."),
+    ]
+
+
+def test_parses_numbered_list_items():
+    text = "1. Figure 1: Model architecture.\n2) **Figure 2.** Training loss."
+    assert parse_figure_captions(text) == [
+        ("1", "Figure 1: Model architecture."),
+        ("2", "Figure 2: Training loss."),
+    ]
+
+
+def test_subfigures_are_separate_entries():
+    text = "Figure 2a: Accuracy.\nFigure 2b: Latency."
+    assert parse_figure_captions(text) == [("2a", "Figure 2a: Accuracy."), ("2b", "Figure 2b: Latency.")]
+    assert figure_label("Fig. 2B shows latency") == "2b"
+
+
+def test_match_by_label_then_token_overlap():
+    full = "Figure 1: Model architecture overview.\n\nFigure 2a: Accuracy on ImageNet validation split."
+    images = {
+        "image1.png": "Figure 1: Model archi",
+        "image2.png": "accuracy imagenet validation",
+        "image3.png": NO_CAPTION,
+    }
+    assert match_captions(images, full) == {
+        "image1.png": "Figure 1: Model architecture overview.",
+        "image2.png": "Figure 2a: Accuracy on ImageNet validation split.",
+    }
+
+
+def test_low_overlap_stays_unmatched():
+    full = "Figure 1: Model architecture overview."
+    assert match_captions({"image1.png": "Figure 9: unrelated scatter plot"}, full) == {}